@@ -0,0 +1,622 @@
+#!/usr/bin/which python3
+'''
+    Benchmarks for the TimeWarrior GUI backend, runs without a display
+    Author: Ben Mason
+'''
+
+__author__ = "Ben Mason"
+__copyright__ = "Copyright 2022"
+__version__ = "2.0.0"
+__email__ = "locutus@the-collective.net"
+__status__ = "Production"
+
+import os
+import sys
+import json
+import math
+import time
+import platform
+import subprocess
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import datetime, timezone, timedelta
+from twtable import TableModel, VirtualTableModel
+import config
+import twdata
+
+SPAWN_LOG_ENV = 'TWGUI_BENCH_SPAWN_LOG'
+
+# Stand-in for "timew", answers export from the data files of TIMEWARRIORDB and
+# accepts every other command without changing the database
+STAND_IN_TIMEW = '''#!%(python)s
+import os, sys, json
+sys.path.insert(0, %(repo)r)
+import twdata
+
+with open(os.environ[%(log_env)r], 'a', encoding='utf-8') as spawn_log:
+    spawn_log.write('timew ' + ' '.join(sys.argv[1:]) + '\\n')
+
+args = sys.argv[1:]
+if args and args[0] == 'export':
+    hint = args[1].lstrip(':') if len(args) > 1 else 'all'
+    json.dump(twdata.export_intervals(hint), sys.stdout)
+elif not args:
+    active = [ i for i in twdata.export_intervals('day') if 'end' not in i ]
+    if active:
+        print('Tracking ' + ' '.join(active[-1].get('tags', [])))
+    else:
+        print('There is no active time tracking.')
+'''
+
+# Stand-in for "icalbuddy", prints a fixed day of meetings
+STAND_IN_ICALBUDDY = '''#!%(python)s
+import os, sys
+
+with open(os.environ[%(log_env)r], 'a', encoding='utf-8') as spawn_log:
+    spawn_log.write('icalbuddy ' + ' '.join(sys.argv[1:]) + '\\n')
+
+for hour in range(8, 18):
+    print('Meeting %%d | %%02d:00 - %%02d:45' %% (hour, hour, hour))
+'''
+
+
+class CountingTreeview:
+    ''' Stand-in for a Tk treeview counting the row operations a redraw costs '''
+
+    def __init__(self):
+        ''' initialize the class '''
+        self.items = {}
+        self.order = []
+        self.operations = 0
+        self.top_fraction = 0.0
+        self.selected = []
+
+    def get_children(self) -> list:
+        return list(self.order)
+
+    def delete(self, iid):
+        self.operations += 1
+        self.order.remove(str(iid))
+        del self.items[str(iid)]
+
+    def insert(self, parent, index, iid=None, values=None) -> str:
+        self.operations += 1
+        self.order.insert(len(self.order) if index == 'end' else index, str(iid))
+        self.items[str(iid)] = values
+        return str(iid)
+
+    def item(self, iid, values=None):
+        self.operations += 1
+        self.items[str(iid)] = values
+
+    def move(self, iid, parent, index):
+        self.operations += 1
+        self.order.remove(str(iid))
+        self.order.insert(index, str(iid))
+
+    def selection(self) -> list:
+        return list(self.selected)
+
+    def yview_moveto(self, fraction: float):
+        self.top_fraction = fraction
+
+    def yview(self) -> 'tuple[float,float]':
+        return self.top_fraction, 1.0
+
+class CountingTable:
+    ''' Stand-in for a PySimpleGUI Table element '''
+
+    def __init__(self):
+        ''' initialize the class '''
+        self.Widget = CountingTreeview() # pylint: disable=invalid-name
+        self.Values = []                 # pylint: disable=invalid-name
+        self.tree_ids = []
+
+def full_rebuild(treeview, table_data: list):
+    ''' Redraw the way Table.update(values=...) does, every row removed and inserted '''
+
+    for iid in treeview.get_children():
+        treeview.delete(iid)
+
+    for index, row in enumerate(table_data):
+        treeview.insert('', 'end', iid=index + 1, values=row)
+
+def bench_table_redraw(row_counts=(10, 100, 1000, 10000)) -> list:
+    '''
+    Compare full table rebuild with the diffing TableModel
+    The new snapshot has one changed row (running task) and one appended row
+    '''
+
+    results = []
+
+    for row_count in row_counts:
+        row_keys = list(range(row_count))
+        table_data = [ ['task ' + str(i), '0:30:00'] for i in row_keys ]
+        new_keys = row_keys + [row_count]
+        new_data = [ list(i) for i in table_data ] + [['new task', 'Active 0:00:01']]
+        new_data[row_count - 1][1] = '0:31:00'
+
+        treeview = CountingTreeview()
+        full_rebuild(treeview, table_data)
+        treeview.operations = 0
+        start = time.perf_counter()
+        full_rebuild(treeview, new_data)
+        full_time = time.perf_counter() - start
+        full_operations = treeview.operations
+
+        table_model = TableModel(CountingTable())
+        table_model.update(row_keys, table_data)
+        table_model.treeview.operations = 0
+        start = time.perf_counter()
+        table_model.update(new_keys, new_data)
+        diff_time = time.perf_counter() - start
+
+        results.append({'rows': row_count,
+            'full_ms': full_time * 1000, 'full_operations': full_operations,
+            'diff_ms': diff_time * 1000, 'diff_operations': table_model.treeview.operations})
+
+    return results
+
+def bench_virtual_table(row_counts=(1000, 10000, 100000)) -> list:
+    '''
+    Compare filling the table with every row against the virtual table,
+    and the cost of jumping to the first row and paging back down
+    '''
+
+    results = []
+
+    for row_count in row_counts:
+        row_keys = list(range(row_count))
+        row_ids = [ row_count - i for i in row_keys ]
+
+        def row_func(index: int) -> list:
+            return ['task ' + str(index), '0:30:00']
+
+        table_model = TableModel(CountingTable())
+        start = time.perf_counter()
+        table_model.update(row_keys, [ row_func(i) for i in row_keys ], row_ids)
+        full_time = time.perf_counter() - start
+
+        virtual_model = VirtualTableModel(CountingTable())
+        start = time.perf_counter()
+        virtual_model.set_source(row_keys, row_ids, row_func)
+        virtual_model.jump_to(row_count)
+        virtual_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        virtual_model.jump_to(0)
+        virtual_model.page(1)
+        jump_time = time.perf_counter() - start
+
+        results.append({'rows': row_count, 'full_ms': full_time * 1000, \
+            'full_items': len(table_model.treeview.items), 'virtual_ms': virtual_time * 1000, \
+            'virtual_items': len(virtual_model.table.treeview.items), \
+            'jump_ms': jump_time * 1000})
+
+    return results
+
+def synthetic_timestamps(count: int) -> list:
+    ''' Return count TimeWarrior timestamps, 30 minutes apart '''
+
+    first = 1500000000
+
+    return [ datetime.fromtimestamp(first + i * 1800, timezone.utc).strftime( \
+        twdata.TW_DATE_FORMAT) for i in range(count) ]
+
+def bench_timestamp_parse(counts=(10000, 100000, 1000000)) -> list:
+    '''
+    Compare the previous per interval strptime + utc_to_local path with the batch
+    parse_tw_timestamps + local_offsets path used by the reports
+    '''
+
+    results = []
+
+    for count in counts:
+        timestamps = synthetic_timestamps(count)
+
+        start = time.perf_counter()
+        for timestamp in timestamps:
+            datetime.strptime(timestamp, twdata.TW_DATE_FORMAT).replace( \
+                tzinfo=timezone.utc).astimezone(tz=None)
+        strptime_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        twdata.local_offsets(twdata.parse_tw_timestamps(timestamps))
+        batch_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        twdata.parse_tw_timestamps(timestamps)
+        epoch_time = time.perf_counter() - start
+
+        results.append({'intervals': count, 'strptime_ms': strptime_time * 1000, \
+            'batch_ms': batch_time * 1000, 'epoch_only_ms': epoch_time * 1000})
+
+    return results
+
+def generate_database(db_path: str, first_day: datetime, days: int, per_day=8, limit=None) -> int:
+    '''
+    Write a synthetic TimeWarrior database, per_day 45 minute intervals every day
+    stops after limit intervals if given, returns number of intervals written
+    '''
+
+    data_dir = os.path.join(db_path, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    tag_names = ['project' + str(i) for i in range(20)]
+    written = 0
+    data_files = {}
+
+    try:
+        for day in range(days):
+            day_start = first_day + timedelta(days=day, hours=8)
+            file_name = day_start.strftime('%Y-%m.data')
+
+            if file_name not in data_files:
+                data_files[file_name] = open(os.path.join(data_dir, file_name), 'w', \
+                    encoding='utf-8')
+
+            for slot in range(per_day):
+                if written == limit:
+                    break
+                start = day_start + timedelta(hours=slot)
+                end = start + timedelta(minutes=45)
+                data_files[file_name].write('inc %s - %s # %s "%s meeting"\n' % ( \
+                    start.strftime(twdata.TW_DATE_FORMAT), end.strftime(twdata.TW_DATE_FORMAT), \
+                    tag_names[written % 20], tag_names[(written * 7) % 20]))
+                written += 1
+    finally:
+        for data_file in data_files.values():
+            data_file.close()
+
+    return written
+
+def peak_memory(func, *args) -> 'tuple[int,object]':
+    ''' Return peak traced memory in bytes and result of a call '''
+
+    tracemalloc.start()
+    result = func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak, result
+
+def bench_streaming_memory(year_counts=(1, 4, 16)) -> list:
+    '''
+    Peak memory of loading a whole multi-year database into an IntervalStore,
+    buffered (list of export entries) against streaming, and of a streamed tag aggregation
+    '''
+
+    results = []
+
+    for years in year_counts:
+        with tempfile.TemporaryDirectory() as db_path:
+            intervals = generate_database(db_path, datetime(2000, 1, 1), years * 365)
+            data_dir = os.path.join(db_path, 'data')
+
+            buffered_peak, _ = peak_memory(lambda: twdata.IntervalStore.from_export( \
+                twdata.export_intervals('all', data_dir)))
+            stream_peak, store = peak_memory(lambda: twdata.IntervalStore.from_stream( \
+                twdata.iter_data_intervals('all', data_dir)))
+            aggregate_peak, _ = peak_memory(lambda: twdata.stream_tag_totals( \
+                twdata.iter_data_intervals('all', data_dir)))
+
+        results.append({'years': years, 'intervals': intervals, 'rows': len(store), \
+            'buffered_peak_mb': buffered_peak / 2**20, 'stream_peak_mb': stream_peak / 2**20, \
+            'aggregate_peak_mb': aggregate_peak / 2**20})
+
+    return results
+
+def bench_parallel_load(years=8, worker_counts=(1, 2, 4, 8)) -> list:
+    '''
+    Load a generated multi-year database with the monthly files parsed on process and
+    thread pools of increasing size
+    '''
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as db_path:
+        intervals = generate_database(db_path, datetime(2000, 1, 1), years * 365)
+        data_dir = os.path.join(db_path, 'data')
+
+        for kind in ('process', 'thread'):
+            for workers in worker_counts:
+                # Warm up the pool so worker start up is not measured
+                twdata.load_store_parallel('all', data_dir, workers, kind)
+                start = time.perf_counter()
+                store = twdata.load_store_parallel('all', data_dir, workers, kind)
+                load_time = time.perf_counter() - start
+
+                results.append({'pool': kind, 'workers': workers, 'intervals': intervals, \
+                    'rows': len(store), 'load_ms': load_time * 1000})
+
+        twdata.LOAD_POOL['executor'].shutdown()
+        twdata.LOAD_POOL['executor'] = None
+
+    return results
+
+def generate_sized_database(db_path: str, intervals: int, per_day=8) -> int:
+    ''' Write a synthetic database of a number of intervals, the last day is today '''
+
+    days = max(1, math.ceil(intervals / per_day))
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0, \
+        tzinfo=None)
+
+    return generate_database(db_path, today - timedelta(days=days - 1), days, per_day, intervals)
+
+def write_stand_ins(bin_dir: str) -> 'tuple[str,str]':
+    ''' Write the timew and icalbuddy stand-in executables, returns their paths '''
+
+    script_values = {'python': sys.executable, 'log_env': SPAWN_LOG_ENV, \
+        'repo': os.path.dirname(os.path.abspath(__file__))}
+    paths = []
+
+    for name, script in (('timew', STAND_IN_TIMEW), ('icalbuddy', STAND_IN_ICALBUDDY)):
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w', encoding='utf-8') as script_file:
+            script_file.write(script % script_values)
+        os.chmod(path, 0o755)
+        paths.append(path)
+
+    return paths[0], paths[1]
+
+@contextlib.contextmanager
+def config_override(**settings):
+    ''' Change config settings for the duration of a with block '''
+
+    saved = { i: getattr(config, i) for i in settings }
+
+    try:
+        for name, value in settings.items():
+            setattr(config, name, value)
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+def spawn_count(spawn_log: str) -> int:
+    ''' Return number of stand-in processes started so far '''
+
+    try:
+        with open(spawn_log, encoding='utf-8') as log_file:
+            return sum(1 for _ in log_file)
+    except OSError:
+        return 0
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    ''' Nearest rank percentile of sorted values '''
+
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+
+    return sorted_values[index]
+
+def measure(func, repeats: int, spawn_log: str) -> dict:
+    ''' Time repeated calls, returns latency percentiles in ms and processes started per call '''
+
+    spawns = spawn_count(spawn_log)
+    timings = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+
+    return {'repeats': repeats, 'p50_ms': percentile(timings, 0.5), \
+        'p90_ms': percentile(timings, 0.9), 'p99_ms': percentile(timings, 0.99), \
+        'max_ms': timings[-1], 'spawns_per_call': (spawn_count(spawn_log) - spawns) / repeats}
+
+def suite_operations(button_logic, calendar_logic) -> list:
+    ''' Return (name, function) of the operations measured by the suite '''
+
+    stop_values = {'starttime': '', 'stoptime': '', 'date': '', 'taskdesc': '', \
+        'duration': '', 'timew_table': []}
+
+    return [
+        ('collect_tasks_list day', lambda: button_logic.collect_tasks_list('day')),
+        ('collect_tasks_list month', lambda: button_logic.collect_tasks_list('month')),
+        ('return_task_table', button_logic.return_task_table),
+        ('get_snapshot', button_logic.get_snapshot),
+        ('get_active_timer', button_logic.get_active_timer),
+        ('button_logic Stop', lambda: button_logic.button_logic('Stop', dict(stop_values))),
+        ('get_report year', lambda: button_logic.get_report('year')),
+        ('get_current_calendar_entry', calendar_logic.get_current_calendar_entry),
+    ]
+
+def run_suite(sizes=(10, 1000, 100000), repeats=20, backends=('export', 'datafile'), \
+        cache=False) -> list:
+    '''
+    Measure the backend operations on synthetic databases of each size with the
+    timew and icalbuddy stand-ins, headless
+    '''
+
+    # Imported here, the micro benchmarks do not need PySimpleGUI
+    from twguiapi import TwButtonLogic, TwCalendarClass # pylint: disable=import-outside-toplevel
+
+    results = []
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            db_path = os.path.join(work_dir, 'timewarrior')
+            bin_dir = os.path.join(work_dir, 'bin')
+            os.makedirs(bin_dir)
+            timew_path, icalbuddy_path = write_stand_ins(bin_dir)
+            spawn_log = os.path.join(work_dir, 'spawn.log')
+            intervals = generate_sized_database(db_path, size)
+
+            saved_environ = {i: os.environ.get(i) for i in ('TIMEWARRIORDB', SPAWN_LOG_ENV)}
+            os.environ['TIMEWARRIORDB'] = db_path
+            os.environ[SPAWN_LOG_ENV] = spawn_log
+
+            try:
+                for backend in backends:
+                    with config_override(CLI_BASE_COMMAND=timew_path, \
+                            ICALBUDDY_LOCATION=icalbuddy_path, CALENDAR_PROVIDER='icalbuddy', \
+                            TW_DATA_BACKEND=backend, INTERVAL_CACHE_ENABLE=cache, \
+                            ROLLUP_CACHE_ENABLE=cache, \
+                            ROLLUP_CACHE_FILE=os.path.join(work_dir, 'rollup_cache.json')):
+                        button_logic = TwButtonLogic()
+                        calendar_logic = TwCalendarClass()
+
+                        for name, func in suite_operations(button_logic, calendar_logic):
+                            result = {'intervals': intervals, 'backend': backend, \
+                                'operation': name}
+                            result.update(measure(func, repeats, spawn_log))
+                            results.append(result)
+            finally:
+                for name, value in saved_environ.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+
+    return results
+
+def first_paint(repo_dir: str):
+    ''' Start the GUI, wait until the window is painted and it exits again '''
+
+    environ = dict(os.environ)
+    environ['TWGUI_FIRST_PAINT'] = '1'
+
+    with subprocess.Popen([sys.executable, os.path.join(repo_dir, 'main.py')], cwd=repo_dir, \
+            env=environ, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as process:
+        painted = any(i.startswith(b'first paint') for i in process.stdout)
+
+    if not painted:
+        raise OSError("GUI did not start")
+
+def startup_results(repeats=5) -> list:
+    '''
+    Cold start times of a new interpreter, importing the GUI modules and the time
+    to the first painted window, the window needs a display
+    '''
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    operations = [
+        ('startup interpreter', [sys.executable, '-c', 'pass']),
+        ('startup import main', [sys.executable, '-c', 'import main']),
+    ]
+    results = []
+
+    for name, cli in operations:
+        try:
+            result = measure(lambda cli=cli: subprocess.run(cli, cwd=repo_dir, check=True, \
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL), repeats, '')
+        except subprocess.CalledProcessError:
+            continue
+        result.update({'intervals': 0, 'backend': '-', 'operation': name})
+        results.append(result)
+
+    try:
+        result = measure(lambda: first_paint(repo_dir), repeats, '')
+        result.update({'intervals': 0, 'backend': '-', 'operation': 'startup first paint'})
+        results.append(result)
+    except OSError:
+        print("Skipped time to first paint, the GUI could not be started (no display?)")
+
+    return results
+
+def save_results(results: list, json_file: str):
+    ''' Store suite results with the version and platform they were measured on '''
+
+    result_data = {'version': __version__, 'python': platform.python_version(), \
+        'platform': platform.platform(), \
+        'measured': datetime.now(timezone.utc).strftime(twdata.TW_DATE_FORMAT), \
+        'results': results}
+
+    with open(json_file, 'w', encoding='utf-8') as result_file:
+        json.dump(result_data, result_file, indent=1)
+
+def compare_results(old_results: list, new_results: list) -> list:
+    ''' Return (intervals, backend, operation, old p50, new p50) of operations in both runs '''
+
+    old_p50 = { (i['intervals'], i['backend'], i['operation']): i['p50_ms'] for i in old_results }
+
+    return [ (i['intervals'], i['backend'], i['operation'], \
+        old_p50[(i['intervals'], i['backend'], i['operation'])], i['p50_ms']) \
+        for i in new_results if (i['intervals'], i['backend'], i['operation']) in old_p50 ]
+
+def main_suite(args) -> int:
+    ''' Run the operation suite, print and optionally store or compare the results '''
+
+    results = run_suite([ int(i) for i in args.sizes.split(',') ], args.repeats, \
+        args.backends.split(','), args.cache)
+    results.extend(startup_results(max(1, args.repeats // 4)))
+
+    print("%9s %9s %-28s %9s %9s %9s %9s %7s" % ('intervals', 'backend', 'operation', \
+        'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'spawns'))
+    for result in results:
+        print("%9d %9s %-28s %9.2f %9.2f %9.2f %9.2f %7.2f" % (result['intervals'], \
+            result['backend'], result['operation'], result['p50_ms'], result['p90_ms'], \
+            result['p99_ms'], result['max_ms'], result['spawns_per_call']))
+
+    if args.json:
+        save_results(results, args.json)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as result_file:
+            old_data = json.load(result_file)
+
+        print("Compared with version %s (p50)" % old_data.get('version'))
+        for intervals, backend, operation, old_ms, new_ms in \
+                compare_results(old_data['results'], results):
+            print("%9d %9s %-28s %9.2f -> %9.2f ms (%+.0f%%)" % (intervals, backend, operation, \
+                old_ms, new_ms, (new_ms / old_ms - 1) * 100 if old_ms else 0))
+
+    return 0
+
+def main():
+    ''' Main Function '''
+
+    parser = argparse.ArgumentParser(description='TimeWarrior GUI benchmarks')
+    parser.add_argument('--suite', action='store_true', \
+        help='measure backend operations with timew and icalbuddy stand-ins')
+    parser.add_argument('--sizes', default='10,1000,100000', \
+        help='comma separated database sizes in intervals (up to 1000000)')
+    parser.add_argument('--repeats', type=int, default=20, help='calls per operation')
+    parser.add_argument('--backends', default='export,datafile', help='TW_DATA_BACKEND values')
+    parser.add_argument('--cache', action='store_true', help='keep the interval and rollup caches')
+    parser.add_argument('--json', help='store suite results in a JSON file')
+    parser.add_argument('--compare', help='compare suite results with an earlier JSON file')
+    args = parser.parse_args()
+
+    if args.suite:
+        return main_suite(args)
+
+    print("Table redraw (rows, full rebuild, diffed update)")
+    for result in bench_table_redraw():
+        print("%8d  full: %9.3f ms %7d ops   diff: %9.3f ms %3d ops" % (result['rows'], \
+            result['full_ms'], result['full_operations'], result['diff_ms'], \
+            result['diff_operations']))
+
+    print("Table fill (rows, all rows, virtual window, jump to top and page down)")
+    for result in bench_virtual_table():
+        print("%8d  full: %9.3f ms %7d items   virtual: %7.3f ms %3d items   jump: %7.3f ms" % ( \
+            result['rows'], result['full_ms'], result['full_items'], result['virtual_ms'], \
+            result['virtual_items'], result['jump_ms']))
+
+    print("Timestamp parsing (intervals, strptime + utc_to_local, batch with local offsets, " \
+        "epoch only)")
+    for result in bench_timestamp_parse():
+        print("%8d  strptime: %9.1f ms   batch: %9.1f ms (%.1fx)   epoch only: %9.1f ms" % ( \
+            result['intervals'], result['strptime_ms'], result['batch_ms'], \
+            result['strptime_ms'] / result['batch_ms'], result['epoch_only_ms']))
+
+    print("Peak memory loading all intervals (years, buffered store, streamed store, " \
+        "streamed tag totals)")
+    for result in bench_streaming_memory():
+        print("%8d  %8d intervals   buffered: %6.1f MB   store: %6.1f MB   totals: %6.2f MB" % ( \
+            result['years'], result['intervals'], result['buffered_peak_mb'], \
+            result['stream_peak_mb'], result['aggregate_peak_mb']))
+
+    print("Parallel load of all monthly files (pool, workers, load time)")
+    for result in bench_parallel_load():
+        print("%8s  %2d workers  %8d intervals   load: %9.1f ms" % (result['pool'], \
+            result['workers'], result['intervals'], result['load_ms']))
+
+    return 0
+
+####### Start Main Function #############
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 '''
     Configuration of the TimeWarrior GUI scripts
 '''
+import os
 import logging
 
 # GUI Astetics
@@ -20,3 +21,71 @@ CLI_BASE_COMMAND = 'timew'
 ICALBUDDY_LOCATION = '/usr/local/bin/icalbuddy'
 ICALBUDDY_CALENDAR='Calendar'
 ICALBUDDY_ENABLE = True
+
+# Source of tracked time data
+#  'export'   - run "timew export" for every refresh
+#  'datafile' - read the TimeWarrior data files directly (honors TIMEWARRIORDB)
+TW_DATA_BACKEND = 'export'
+# First day of the week for the ':week' range, 0 = Monday ... 6 = Sunday
+TW_WEEKSTART = 0
+# Reuse the parsed interval list while the data files and undo.data are unchanged
+INTERVAL_CACHE_ENABLE = True
+# Show the active timer from the task snapshot instead of running "timew" again
+SNAPSHOT_ACTIVE_TIMER = True
+# Run TimeWarrior commands on a worker thread so the window never freezes
+BACKGROUND_EXECUTION = True
+# Update elapsed time of the running task every n milliseconds (0 disables), runs no commands
+TICK_INTERVAL_MS = 1000
+# Refresh the task table when the TimeWarrior data files change (inotify or polling)
+WATCH_DATA_FILES = True
+WATCH_POLL_INTERVAL = 2.0
+WATCH_DEBOUNCE = 0.5
+# Seconds to reuse the parsed iCalBuddy eventsToday list (Refresh drops it)
+ICALBUDDY_CACHE_TTL = 300
+
+# Calendar backend for the meeting buttons
+#  'icalbuddy' - macOS iCalBuddy (ICALBUDDY_LOCATION)
+#  'ics'       - local .ics files listed in ICS_CALENDAR_FILES
+CALENDAR_PROVIDER = 'icalbuddy'
+ICS_CALENDAR_FILES = []
+# Days of recurring .ics events expanded into the calendar index at once
+ICS_EXPAND_DAYS = 31
+# Read intervals one at a time from "timew export" / the data files, memory stays flat
+# for long ranges
+STREAM_EXPORT = False
+# Persistent per day / per tag totals used by reports, stored next to this file
+ROLLUP_CACHE_ENABLE = True
+ROLLUP_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rollup_cache.json')
+# Parse monthly data files of the 'datafile' backend on a pool ('thread' or 'process',
+# processes are spawned as the GUI runs threads), 1 loads serially
+DATA_LOAD_WORKERS = 1
+DATA_LOAD_POOL = 'thread'
+# Task table, rows shown and virtual mode inserting only the shown rows plus
+# TABLE_PAGE_BUFFER rows on either side into the table widget
+TABLE_ROWS = 20
+TABLE_VIRTUAL = True
+TABLE_PAGE_BUFFER = 20
+# Apply the expected effect of Start, Stop, Track, Continue and Delete to the table
+# before the command finished (needs BACKGROUND_EXECUTION), rolled back if it fails
+OPTIMISTIC_UPDATES = True
+# Tag suggestions for the Task field (0 disables), ranked by use count decayed
+# with a half life in days since the tag was last used
+TAG_SUGGESTIONS = 8
+TAG_RECENCY_HALF_LIFE = 30
+# Timing of processes, export parsing, table builds and window updates, kept in a
+# ring buffer of PERF_BUFFER_SIZE records, shown with the Diagnostics button and
+# written to PERF_DUMP_FILE (if set) on exit
+PERF_INSTRUMENTATION = False
+PERF_BUFFER_SIZE = 2000
+PERF_DUMP_FILE = ''
+# State daemon (twdaemon.py serve), socket path ('' uses the runtime directory)
+# and whether the GUI attaches to a running daemon
+DAEMON_SOCKET = ''
+DAEMON_ATTACH = True
+# Gaps window, untracked time is only reported within the working hours (local HH:MM,
+# an end not after the start runs past midnight) of the week days (Monday is 0) and
+# when at least GAP_MIN_MINUTES long
+GAP_DAY_START = '08:00'
+GAP_DAY_END = '18:00'
+GAP_WEEKDAYS = (0, 1, 2, 3, 4)
+GAP_MIN_MINUTES = 5
@@ -10,11 +10,19 @@ __version__ = "2.0.0"
 __email__ = "locutus@the-collective.net"
 __status__ = "Production"
 
+import os
 import logging
 from datetime import datetime
 import PySimpleGUI as sg
-from twguiapi import TwButtonLogic, TwCalendarClass
+from twguiapi import TwButtonLogic, TwCalendarClass, TwSnapshot
+from twworker import CommandWorker, WORKER_EVENT, WORKER_ERROR_EVENT
+from twtable import TableModel, VirtualTableModel
+from twwatch import DataWatcher, WATCH_EVENT
 import config
+import twperf
+
+# Set to print the time to the first painted window and exit, used by benchmark.py
+FIRST_PAINT_ENV = 'TWGUI_FIRST_PAINT'
 
 def validate_date(date_text: str) -> bool:
     ''' Validate Date is correct format '''
@@ -74,6 +82,61 @@ def input_error_check(event, values) -> int:
 
     return error_val
 
+def update_task_view(window, twbuttonlogic, snapshot, table_model):
+    ''' Update task table and active timer from a snapshot, only changed rows are redrawn '''
+
+    with twperf.span('window_update'):
+        if snapshot is None:
+            # Loading failed, an empty table is shown instead of loading again
+            tasks = TwSnapshot([])
+            window['status_result'].update("Unable to collect tasks")
+        else:
+            tasks = twbuttonlogic.filter_snapshot(snapshot)
+
+        if isinstance(table_model, VirtualTableModel):
+            # Only the rows around the shown window are built
+            table_model.set_source(tasks.row_keys(), tasks.task_ids(), tasks.table_row)
+            table_data = table_model.table_data()
+            window['table_position'].update(table_model.position_text())
+        else:
+            table_data, _ = twbuttonlogic.return_task_table(tasks)
+            table_model.update(tasks.row_keys(), table_data, tasks.task_ids())
+
+        if snapshot is None:
+            window['curr_tracking'].update("")
+        else:
+            window['curr_tracking'].update(twbuttonlogic.get_tracking_status(snapshot))
+
+    return table_data
+
+def show_first_snapshot(window, twbuttonlogic, snapshot, table_model):
+    ''' Replace the loading state with the first snapshot, the virtual table shows the latest rows '''
+
+    table_data = update_task_view(window, twbuttonlogic, snapshot, table_model)
+
+    if isinstance(table_model, VirtualTableModel):
+        table_model.jump_to(len(table_model))
+        window['table_position'].update(table_model.position_text())
+
+    if snapshot is not None:
+        window['status_result'].update("")
+
+    return table_data
+
+def update_active_row(window, snapshot, table_model):
+    '''
+    Refresh elapsed time of the running task in the table and "Current Tracking" field
+    Only the one table row is changed, no TimeWarrior command is run
+    '''
+
+    if snapshot is None or snapshot.active_task is None:
+        return
+
+    _, row = snapshot.active_row()
+    table_model.update_row(snapshot.active_key(), row)
+
+    window['curr_tracking'].update(snapshot.tracking_text())
+
 def main():
     ''' Main Function '''
 
@@ -86,22 +149,25 @@ def main():
     else:
         twbuttonlogic = TwButtonLogic()
 
+    # Attach to a running state daemon, queries and commands go through its socket
+    if config.DAEMON_ATTACH:
+        import twdaemon # pylint: disable=import-outside-toplevel
+        if twdaemon.daemon_running():
+            twbuttonlogic.daemon_client = twdaemon.TwDaemonClient()
+            logging.info("attached to daemon %s", twbuttonlogic.daemon_client.socket_path)
+
     input_tfields = [ "date", "starttime", "stoptime", "taskdesc", "duration" ]
     timew_summary_columns = ['Tag', 'Duration']
 
     #
-    # Load inital tracked time data
-    twbuttonlogic.collect_tasks_list()
-
-    table_data, tag_len = twbuttonlogic.return_task_table()
-    logging.debug("tag_len: %s", tag_len)
+    # Tracked time is loaded once the window is shown
+    snapshot = None
+    tick_timeout = config.TICK_INTERVAL_MS if config.TICK_INTERVAL_MS else None
 
     # if empty table set correct column and rows
+    table_data = [[" "*27,""]]
 
-    table_data.append([" "*27,""])
-
-
-    active_timer = twbuttonlogic.get_active_timer()
+    active_timer = "Loading..."
 
     #
     # Define the window's contents
@@ -109,7 +175,11 @@ def main():
 
     layout = [
             [ sg.Text("Task:", size=(5, 1), font=config.GLOBAL_FONT), \
-                sg.Input(key="taskdesc", size=(35,1), font=config.GLOBAL_FONT) ], \
+                sg.Input(key="taskdesc", size=(35,1), font=config.GLOBAL_FONT, \
+                    enable_events=config.TAG_SUGGESTIONS > 0) ], \
+            [ sg.Text("", size=(5, 1), font=config.GLOBAL_FONT), \
+                sg.Listbox(values=[], key='tag_suggestions', size=(35, 3), enable_events=True, \
+                    visible=config.TAG_SUGGESTIONS > 0, font=config.GLOBAL_FONT) ], \
             [ sg.Frame(layout=[
                 [ sg.Text("Start Time:", size=(8, 1), font=config.GLOBAL_FONT), \
                     sg.Input(key="starttime", size=(12,1), font=config.GLOBAL_FONT), \
@@ -133,7 +203,11 @@ def main():
                 sg.Button('Delete', size=(config.BUTTON_SIZE, 1),font=config.GLOBAL_FONT), \
                 sg.Button('Details', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT), \
                 sg.Button('Rename', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT) ], \
-            [ sg.Button('Refresh', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT), ],
+            [ sg.Button('Refresh', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT), \
+                sg.Button('Report', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT), \
+                sg.Button('Gaps', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT), \
+                sg.Button('Diagnostics', font=config.GLOBAL_FONT, \
+                    visible=config.PERF_INSTRUMENTATION) ],
             # Calendar Buttons inserted here if enabled
             # Text Boxes
             [ sg.Text("Current Tracking:", size=(13,1), font=config.GLOBAL_FONT),
@@ -145,19 +219,72 @@ def main():
             [ sg.Table(values=table_data, headings=timew_summary_columns, max_col_width=30,
                     display_row_numbers=False,
                     justification='left',
-                    num_rows=20,
+                    num_rows=config.TABLE_ROWS,
                     key='timew_table',
                     tooltip='Todays Data',
                     font=config.GLOBAL_FONT)]
         ]
 
+    layout.append([ sg.Text("Filter:", size=(5, 1), font=config.GLOBAL_FONT), \
+        sg.Input(key='tag_filter', size=(24,1), font=config.GLOBAL_FONT, \
+            tooltip='Comma separated tags, +tag required, -tag excluded'), \
+        sg.Button('Filter', font=config.GLOBAL_FONT) ])
+
+    if config.TABLE_VIRTUAL:
+        layout.append([ sg.Button('Page Up', font=config.GLOBAL_FONT), \
+            sg.Button('Page Down', font=config.GLOBAL_FONT), \
+            sg.Button('Latest', font=config.GLOBAL_FONT), \
+            sg.Text(size=(20,1), key='table_position', font=config.GLOBAL_FONT) ])
+
     if config.ICALBUDDY_ENABLE:
         calendar_buttons = [ sg.Button('Start Meeting', font=config.GLOBAL_FONT), \
             sg.Button('Fix Start', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT), \
             sg.Button('Calendar Track', font=config.GLOBAL_FONT)]
-        layout.insert(4, calendar_buttons)
+        layout.insert(5, calendar_buttons)
+
+    window = sg.Window('Timewarrior Tracking', layout, finalize=True)
+
+    if config.TABLE_VIRTUAL:
+        table_model = VirtualTableModel(window['timew_table'], config.TABLE_ROWS, \
+            config.TABLE_PAGE_BUFFER)
 
-    window = sg.Window('Timewarrior Tracking', layout)
+        # Follow scrolling of the table itself to refill the page buffer
+        for scroll_event in ('<MouseWheel>', '<Button-4>', '<Button-5>', '<KeyRelease>'):
+            window['timew_table'].bind(scroll_event, '+SCROLL')
+    else:
+        table_model = TableModel(window['timew_table'])
+
+    window['status_result'].update("Loading...")
+    window.refresh()
+
+    if os.environ.get(FIRST_PAINT_ENV):
+        print("first paint", flush=True)
+        window.close()
+        return 0
+
+    worker = None
+    if config.BACKGROUND_EXECUTION:
+        worker = CommandWorker(window)
+        twbuttonlogic.worker = worker
+
+    # Optimistic updates shown in the table, snapshots read before the latest one are stale
+    action_no = 0
+
+    #
+    # Load inital tracked time data, in the background if enabled
+    loading = worker is not None
+    if worker is not None:
+        worker.submit_read('snapshot', twbuttonlogic.get_snapshot, tag=action_no)
+    else:
+        snapshot = twbuttonlogic.get_snapshot()
+        table_data = show_first_snapshot(window, twbuttonlogic, snapshot, table_model)
+        if config.TAG_SUGGESTIONS > 0:
+            twbuttonlogic.build_tag_index()
+
+    watcher = None
+    if config.WATCH_DATA_FILES:
+        watcher = DataWatcher(window)
+        watcher.start()
 
     #
     ####### Event Loop
@@ -166,42 +293,170 @@ def main():
         logging.debug("table_data: %s", table_data)
         #
         # Read Button triggers
-        event, values = window.read()
+        event, values = window.read(timeout=tick_timeout)
 
         # Clean up and Close
         if event in (sg.WINDOW_CLOSED, 'Quit'):
             break
 
         #
-        # Input Validation
-        if input_error_check(event, values) > 0:
+        # Timer tick, update elapsed time of the running task
+        if event == sg.TIMEOUT_EVENT:
+            update_active_row(window, snapshot, table_model)
             continue
 
         #
-        # Button Logic
-        result, result_display = twbuttonlogic.button_logic(event, values)
-        logging.debug("button_logic result: %s", result)
+        # Suggest tags used before while the task name is typed
+        if event == 'taskdesc':
+            window['tag_suggestions'].update(values=twbuttonlogic.get_tag_suggestions( \
+                values['taskdesc']) if values['taskdesc'] else [])
+            continue
+
+        if event == 'tag_suggestions':
+            if values['tag_suggestions']:
+                window['taskdesc'].update(values['tag_suggestions'][0])
+                window['tag_suggestions'].update(values=[])
+            continue
 
         #
-        # Update list of tracked time for today
-        table_data, tag_len = twbuttonlogic.return_task_table()
-        window['timew_table'].update(values=table_data)
+        # Show only tasks matching the tag filter
+        if event == 'Filter':
+            twbuttonlogic.set_tag_filter(values['tag_filter'])
+            table_data = update_task_view(window, twbuttonlogic, snapshot, table_model)
+            continue
 
-        active_timer = twbuttonlogic.get_active_timer()
-        window['curr_tracking'].update(active_timer)
+        #
+        # Move the window of the virtual table
+        if event in ('timew_table+SCROLL', 'Page Up', 'Page Down', 'Latest'):
+            if event == 'timew_table+SCROLL':
+                table_model.scrolled()
+            elif event == 'Latest':
+                table_model.jump_to(len(table_model))
+            else:
+                table_model.page(-1 if event == 'Page Up' else 1)
+            window['table_position'].update(table_model.position_text())
+            continue
 
         #
-        # Return results and Status
-        window['status_result'].update(result_display)
-        window['cliout'].update(str(result, config.ENCODING))
+        # TimeWarrior data changed outside of the GUI
+        if event == WATCH_EVENT:
+            if worker is not None:
+                worker.submit_read('snapshot', twbuttonlogic.get_snapshot, tag=action_no)
+            else:
+                snapshot = twbuttonlogic.get_snapshot()
+                table_data = update_task_view(window, twbuttonlogic, snapshot, table_model)
+            continue
+
+        #
+        # Data a button handler needs was read on the worker, the button is handled now
+        prepared = None
+        if event == WORKER_EVENT and values[event][0] == 'prepare':
+            _, prepared, (event, values) = values[event]
+        #
+        # Results posted by the background worker
+        elif event in (WORKER_EVENT, WORKER_ERROR_EVENT):
+            job_name, job_result, job_tag = values[event]
+
+            if event == WORKER_ERROR_EVENT:
+                window['status_result'].update("Error: " + str(job_result))
+            elif job_name == 'command':
+                result, result_display, failed = job_result
+                if failed and job_tag is not None:
+                    # Command rejected, back to the state before the optimistic update
+                    snapshot = job_tag
+                    table_data = update_task_view(window, twbuttonlogic, snapshot, table_model)
+                    result_display = "Rolled back: " + result_display
+                window['status_result'].update(result_display)
+                window['cliout'].update(str(result, config.ENCODING))
+            elif job_name == 'snapshot' and job_tag == action_no:
+                snapshot = job_result
+                if loading:
+                    table_data = show_first_snapshot(window, twbuttonlogic, snapshot, table_model)
+                    loading = False
+                    if config.TAG_SUGGESTIONS > 0:
+                        worker.submit_read('tag_index', twbuttonlogic.build_tag_index)
+                else:
+                    table_data = update_task_view(window, twbuttonlogic, snapshot, table_model)
+            elif job_name == 'tag_index' and not worker.busy():
+                # Built right after the first snapshot, "Busy..." was shown for it
+                window['status_result'].update("")
+
+            if worker.busy():
+                window['status_result'].update("Busy...")
+
+            continue
+        else:
+            #
+            # Input Validation
+            if input_error_check(event, values) > 0:
+                continue
+
+            # @ids of the selected rows from the table model, treeview item ids are not row numbers
+            values['timew_table'] = table_model.selected_ids()
+
+            # Calendar lookups and range loads run on the worker before the handler opens
+            if worker is not None and event in twbuttonlogic.PREPARED_EVENTS:
+                worker.submit_read('prepare', twbuttonlogic.prepare_button, event, \
+                    tag=(event, values))
+                window['status_result'].update("Loading...")
+                continue
+
+        if worker is None:
+            #
+            # Button Logic
+            result, result_display = twbuttonlogic.button_logic(event, values)
+            logging.debug("button_logic result: %s", result)
+
+            #
+            # Update list of tracked time for today
+            snapshot = twbuttonlogic.get_snapshot()
+            table_data = update_task_view(window, twbuttonlogic, snapshot, table_model)
+
+            #
+            # Return results and Status
+            window['status_result'].update(result_display)
+            window['cliout'].update(str(result, config.ENCODING))
+        else:
+            #
+            # Build command on GUI thread, run command and refresh on the worker
+            cli, result_display = twbuttonlogic.button_command(event, values, prepared)
+
+            # Show the expected result right away, the snapshot read after the command
+            # reconciles it, a failed command rolls back to the previous snapshot
+            rollback_snapshot = None
+            if config.OPTIMISTIC_UPDATES and cli:
+                predicted = twbuttonlogic.predict_snapshot(event, values, snapshot)
+                if predicted is not None:
+                    rollback_snapshot = snapshot
+                    snapshot = predicted
+                    action_no += 1
+                    table_data = update_task_view(window, twbuttonlogic, snapshot, table_model)
+
+            worker.submit_write('command', twbuttonlogic.run_command_status, cli, result_display, \
+                tag=rollback_snapshot)
+            worker.submit_read('snapshot', twbuttonlogic.get_snapshot, tag=action_no)
+            window['status_result'].update("Busy...")
 
         #
         # clear input fields
         for i in input_tfields:
             window[i].update('')
+        window['tag_suggestions'].update(values=[])
+
+    if worker is not None:
+        worker.stop()
+    if watcher is not None:
+        watcher.stop()
 
     window.close()
 
+    if config.PERF_INSTRUMENTATION and config.PERF_DUMP_FILE:
+        # The window is closed, a failed dump is only logged
+        try:
+            twperf.RECORDER.dump(config.PERF_DUMP_FILE)
+        except OSError as error:
+            logging.error("Timings dump to %s failed: %s", config.PERF_DUMP_FILE, error)
+
     return 0
 
 ####### Start Main Function #############
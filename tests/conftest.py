@@ -0,0 +1,25 @@
+'''
+    Test configuration, the scripts are run from the repository root and import
+    each other as top level modules
+'''
+
+import os
+import sys
+import time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    ''' Return a function switching the local time zone for the test '''
+
+    def set_timezone(zone: str):
+        monkeypatch.setenv('TZ', zone)
+        time.tzset()
+
+    yield set_timezone
+
+    monkeypatch.undo()
+    time.tzset()
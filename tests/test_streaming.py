@@ -0,0 +1,102 @@
+'''
+    Streaming export parsing and aggregation, memory must not grow with the range
+'''
+
+import io
+import os
+import json
+import tracemalloc
+from datetime import datetime, timedelta
+import pytest
+import twdata
+
+EXPORT_TEXT = json.dumps([
+    {'id': 3, 'start': '20261012T080000Z', 'end': '20261012T093000Z', 'tags': ['a,]', '[b']},
+    {'id': 2, 'start': '20261012T100000Z', 'end': '20261012T110000Z', \
+        'annotation': 'brace } and "quote"'},
+    {'id': 1, 'start': '20261013T090000Z', 'tags': ['dev']},
+], indent=1)
+
+
+def write_database(data_dir: str, years: int) -> int:
+    ''' Write 8 intervals a day for a number of years, returns number of intervals '''
+
+    written = 0
+    day_start = datetime(2000, 1, 1, 8)
+
+    for day in range(years * 365):
+        start = day_start + timedelta(days=day)
+        with open(os.path.join(data_dir, start.strftime('%Y-%m.data')), 'a', \
+                encoding='utf-8') as data_file:
+            for slot in range(8):
+                slot_start = start + timedelta(hours=slot)
+                data_file.write('inc %s - %s # project%s\n' % ( \
+                    slot_start.strftime(twdata.TW_DATE_FORMAT), \
+                    (slot_start + timedelta(minutes=45)).strftime(twdata.TW_DATE_FORMAT), \
+                    written % 20))
+                written += 1
+
+    return written
+
+def traced_memory(func) -> 'tuple[int,int,object]':
+    ''' Return memory held after a call, peak memory during it and its result '''
+
+    tracemalloc.start()
+    try:
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return current, peak, result
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 65536])
+def test_iter_json_array_chunk_sizes(chunk_size):
+    items = list(twdata.iter_json_array(io.StringIO(EXPORT_TEXT), chunk_size))
+
+    assert items == json.loads(EXPORT_TEXT)
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 65536])
+def test_iter_json_array_truncated_input(chunk_size):
+    items = twdata.iter_json_array(io.StringIO(EXPORT_TEXT[:-40]), chunk_size)
+
+    assert next(items)['id'] == 3
+    with pytest.raises(json.JSONDecodeError):
+        list(items)
+
+def test_iter_json_array_empty():
+    assert not list(twdata.iter_json_array(io.StringIO('[\n]\n'), 1))
+    assert not list(twdata.iter_json_array(io.StringIO(''), 1))
+
+@pytest.fixture(scope='module')
+def databases(tmp_path_factory) -> dict:
+    ''' Data directories of a 1 year and a 4 year database '''
+
+    data_dirs = {}
+
+    for years in (1, 4):
+        data_dir = tmp_path_factory.mktemp('db%s' % years)
+        write_database(str(data_dir), years)
+        data_dirs[years] = str(data_dir)
+
+    return data_dirs
+
+def test_stream_tag_totals_memory_is_flat(databases):
+    peaks = {}
+
+    for years, data_dir in databases.items():
+        _, peaks[years], totals = traced_memory(lambda data_dir=data_dir: \
+            twdata.stream_tag_totals(twdata.iter_data_intervals('all', data_dir)))
+        assert sum(totals.values()) == years * 365 * 8 * 45 * 60
+
+    assert peaks[4] < peaks[1] * 1.5
+
+def test_store_from_stream_buffers_one_interval(databases):
+    for years, data_dir in databases.items():
+        held, peak, store = traced_memory(lambda data_dir=data_dir: \
+            twdata.IntervalStore.from_stream(twdata.iter_data_intervals('all', data_dir)))
+
+        assert len(store) == years * 365 * 8
+        # The columns grow with the range, anything on top of them stays small
+        assert held / len(store) < 80
+        assert peak - held < 64 * 1024
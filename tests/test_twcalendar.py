@@ -0,0 +1,258 @@
+'''
+    Parsing of .ics files, RRULE expansion and the calendar interval index
+'''
+
+import random
+from datetime import datetime, timedelta, timezone
+import pytest
+import twcalendar
+
+UTC = timezone.utc
+
+def ics_calendar(*event_lines) -> str:
+    ''' Wrap VEVENT property lines in a VCALENDAR with CRLF line ends '''
+
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0']
+    for event in event_lines:
+        lines += ['BEGIN:VEVENT'] + list(event) + ['END:VEVENT']
+    lines.append('END:VCALENDAR')
+
+    return '\r\n'.join(lines) + '\r\n'
+
+def utc_event(summary: str, start_hour: float, end_hour: float) -> 'twcalendar.CalendarEvent':
+    ''' Event on 2026-10-19 between two (fractional) UTC hours '''
+
+    day = datetime(2026, 10, 19, tzinfo=UTC)
+
+    return twcalendar.CalendarEvent(summary, day + timedelta(hours=start_hour), \
+        day + timedelta(hours=end_hour))
+
+def utc_time(hour: float) -> datetime:
+    ''' Time on 2026-10-19 at a (fractional) UTC hour '''
+    return datetime(2026, 10, 19, tzinfo=UTC) + timedelta(hours=hour)
+
+def summaries(event_list: list) -> list:
+    ''' Event summaries in index order '''
+    return [ i.summary for i in event_list ]
+
+def test_parse_ics_unfolds_continuation_lines():
+    ics_text = ics_calendar([
+        'UID:folded',
+        'SUMMARY:Quarterly planning with the',
+        '  product team\\, part 1',
+        '\tand 2',
+        'DTSTART:20261019T090000Z',
+        'DTEND:20261019T100000Z',
+    ])
+
+    event, = twcalendar.parse_ics(ics_text)
+
+    assert event.summary == 'Quarterly planning with the product team, part 1and 2'
+    assert event.uid == 'folded'
+
+def test_parse_ics_utc_and_tzid_times(local_timezone):
+    local_timezone('America/New_York')
+    ics_text = ics_calendar([
+        'UID:utc',
+        'SUMMARY:UTC standup',
+        'DTSTART:20261019T090000Z',
+        'DURATION:PT15M',
+    ], [
+        'UID:berlin',
+        'SUMMARY:Berlin review',
+        'DTSTART;TZID=Europe/Berlin:20261019T090000',
+        'DTEND;TZID=Europe/Berlin:20261019T103000',
+    ], [
+        'UID:floating',
+        'SUMMARY:Floating lunch',
+        'DTSTART:20261019T120000',
+        'DTEND:20261019T130000',
+    ])
+
+    window = (datetime(2026, 10, 18, tzinfo=UTC), datetime(2026, 10, 21, tzinfo=UTC))
+    occurrences = {}
+    for event in twcalendar.parse_ics(ics_text):
+        occurrence, = event.occurrences(*window)
+        occurrences[occurrence.summary] = (occurrence.start.astimezone(UTC), \
+            occurrence.end.astimezone(UTC))
+
+    assert occurrences == {
+        'UTC standup': (utc_time(9), utc_time(9.25)),
+        # CEST is UTC+2, times without a zone are local time (EDT is UTC-4)
+        'Berlin review': (utc_time(7), utc_time(8.5)),
+        'Floating lunch': (utc_time(16), utc_time(17)),
+    }
+
+def test_parse_ics_all_day_event():
+    ics_text = ics_calendar([
+        'UID:holiday',
+        'SUMMARY:Holiday',
+        'DTSTART;VALUE=DATE:20261020',
+    ], [
+        'UID:trip',
+        'SUMMARY:Trip',
+        'DTSTART;VALUE=DATE:20261021',
+        'DTEND;VALUE=DATE:20261024',
+    ])
+
+    holiday, trip = twcalendar.parse_ics(ics_text)
+
+    assert holiday.all_day and trip.all_day
+    assert holiday.dtstart == datetime(2026, 10, 20)
+    assert holiday.duration == timedelta(days=1)
+    assert trip.duration == timedelta(days=3)
+
+    window = (datetime(2026, 10, 1, tzinfo=UTC), datetime(2026, 11, 1, tzinfo=UTC))
+    occurrence, = holiday.occurrences(*window)
+    assert occurrence.all_day
+    assert occurrence.end - occurrence.start == timedelta(days=1)
+
+def test_parse_ics_skips_cancelled_events():
+    ics_text = ics_calendar([
+        'UID:cancelled',
+        'SUMMARY:Cancelled',
+        'DTSTART:20261019T090000Z',
+        'STATUS:CANCELLED',
+    ], [
+        'UID:kept',
+        'SUMMARY:Kept',
+        'DTSTART:20261019T090000Z',
+    ])
+
+    assert [ i.summary for i in twcalendar.parse_ics(ics_text) ] == ['Kept']
+
+def test_expand_rrule_count():
+    dtstart = datetime(2026, 10, 19, 9)
+    occurrences = twcalendar.expand_rrule(dtstart, {'FREQ': 'DAILY', 'COUNT': '3'}, \
+        datetime(2027, 1, 1))
+
+    assert occurrences == [ dtstart + timedelta(days=i) for i in range(3) ]
+
+def test_expand_rrule_count_stops_before_window_end():
+    dtstart = datetime(2026, 10, 19, 9)
+    occurrences = twcalendar.expand_rrule(dtstart, \
+        {'FREQ': 'WEEKLY', 'INTERVAL': '2', 'COUNT': '10'}, datetime(2026, 11, 10))
+
+    assert occurrences == [ dtstart + timedelta(weeks=i) for i in (0, 2, 4) ]
+
+@pytest.mark.parametrize('until, days', [
+    ('20261021T090000Z', 3),    # the UNTIL time itself is included
+    ('20261021T085959Z', 2),
+    ('20261021', 3),            # a DATE includes the whole day
+])
+def test_expand_rrule_until(until, days):
+    dtstart = datetime(2026, 10, 19, 9)
+    occurrences = twcalendar.expand_rrule(dtstart, {'FREQ': 'DAILY', 'UNTIL': until}, \
+        datetime(2027, 1, 1))
+
+    assert occurrences == [ dtstart + timedelta(days=i) for i in range(days) ]
+
+def test_expand_rrule_weekly_byday():
+    # Starts on a Wednesday, the Monday of the first week is before DTSTART
+    dtstart = datetime(2026, 10, 21, 9)
+    occurrences = twcalendar.expand_rrule(dtstart, \
+        {'FREQ': 'WEEKLY', 'BYDAY': 'FR,MO,WE', 'COUNT': '4'}, datetime(2027, 1, 1))
+
+    assert occurrences == [datetime(2026, 10, 21, 9), datetime(2026, 10, 23, 9), \
+        datetime(2026, 10, 26, 9), datetime(2026, 10, 28, 9)]
+
+def test_expand_rrule_monthly_byday_ordinal():
+    dtstart = datetime(2026, 10, 30, 16)
+    occurrences = twcalendar.expand_rrule(dtstart, \
+        {'FREQ': 'MONTHLY', 'BYDAY': '-1FR', 'COUNT': '3'}, datetime(2027, 6, 1))
+
+    # Last Friday of October, November and December 2026
+    assert occurrences == [datetime(2026, 10, 30, 16), datetime(2026, 11, 27, 16), \
+        datetime(2026, 12, 25, 16)]
+
+def test_exdate_and_recurrence_id_override():
+    ics_text = ics_calendar([
+        'UID:standup',
+        'SUMMARY:Standup',
+        'DTSTART:20261019T090000Z',
+        'DTEND:20261019T091500Z',
+        'RRULE:FREQ=DAILY;COUNT=5',
+        'EXDATE:20261020T090000Z',
+    ], [
+        'UID:standup',
+        'SUMMARY:Standup (moved)',
+        'RECURRENCE-ID:20261022T090000Z',
+        'DTSTART:20261022T140000Z',
+        'DTEND:20261022T141500Z',
+    ])
+
+    window = (datetime(2026, 10, 18, tzinfo=UTC), datetime(2026, 10, 31, tzinfo=UTC))
+    occurrences = []
+    for event in twcalendar.parse_ics(ics_text):
+        occurrences.extend(event.occurrences(*window))
+    index = twcalendar.CalendarIndex(occurrences)
+
+    assert [ (i.summary, i.start) for i in index.events ] == [
+        ('Standup', utc_time(9)),
+        ('Standup', utc_time(24 + 24 + 9)),
+        ('Standup (moved)', utc_time(24 * 3 + 14)),
+        ('Standup', utc_time(24 * 4 + 9)),
+    ]
+
+def test_index_at_boundaries():
+    index = twcalendar.CalendarIndex([utc_event('first', 9, 10), utc_event('second', 10, 11)])
+
+    # Events are half open, an event is running at its start but not at its end
+    assert summaries(index.at(utc_time(9))) == ['first']
+    assert summaries(index.at(utc_time(10))) == ['second']
+    assert summaries(index.at(utc_time(10.5))) == ['second']
+    assert not index.at(utc_time(11))
+    assert not index.at(utc_time(8.99))
+
+def test_index_between_boundaries():
+    index = twcalendar.CalendarIndex([utc_event('first', 9, 10), utc_event('second', 10, 11)])
+
+    # Ranges touching an event do not overlap it
+    assert not index.between(utc_time(8), utc_time(9))
+    assert not index.between(utc_time(11), utc_time(12))
+    assert summaries(index.between(utc_time(9.5), utc_time(10))) == ['first']
+    assert summaries(index.between(utc_time(10), utc_time(10.5))) == ['second']
+    assert summaries(index.between(utc_time(9.99), utc_time(10.01))) == ['first', 'second']
+
+def test_index_overlapping_and_nested_events():
+    index = twcalendar.CalendarIndex([
+        utc_event('all day', 0, 24),
+        utc_event('morning', 8, 12),
+        utc_event('call', 9, 9.5),
+        utc_event('lunch', 12, 13),
+        utc_event('late', 20, 22),
+    ])
+
+    # A long event starting early is found for ranges far after its start
+    assert summaries(index.at(utc_time(21))) == ['all day', 'late']
+    assert summaries(index.at(utc_time(9.25))) == ['all day', 'morning', 'call']
+    assert summaries(index.between(utc_time(11), utc_time(12.5))) == \
+        ['all day', 'morning', 'lunch']
+    assert summaries(index.between(utc_time(-2), utc_time(-1))) == []
+
+def test_index_matches_linear_scan():
+    generator = random.Random(7)
+    event_list = []
+    for number in range(300):
+        start = generator.uniform(0, 240)
+        event_list.append(utc_event(str(number), start, start + generator.choice( \
+            [0.25, 0.5, 1, 2, 30])))
+    index = twcalendar.CalendarIndex(event_list)
+
+    for _ in range(200):
+        query_start = generator.uniform(-10, 260)
+        query_end = query_start + generator.uniform(0, 20)
+        expected = [ i for i in index.events \
+            if i.start < utc_time(query_end) and i.end > utc_time(query_start) ]
+        assert index.between(utc_time(query_start), utc_time(query_end)) == expected
+
+        expected = [ i for i in index.events \
+            if i.start <= utc_time(query_start) < i.end ]
+        assert index.at(utc_time(query_start)) == expected
+
+def test_empty_index():
+    index = twcalendar.CalendarIndex([])
+
+    assert len(index) == 0
+    assert not index.at(utc_time(9))
+    assert not index.between(utc_time(0), utc_time(24))
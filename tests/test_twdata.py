@@ -0,0 +1,131 @@
+'''
+    Parity of the native data file reader with "timew export"
+    The synthetic database is compared with its recorded export, and with the output of
+    the real timew when it is installed
+'''
+
+import os
+import json
+import shutil
+import subprocess
+from datetime import datetime, timezone
+import pytest
+import twdata
+
+# Data files as written by timew, tags sorted and quoted when needed, annotations quoted
+DATA_FILES = {
+    '2026-09.data': [
+        'inc 20260915T080000Z - 20260915T090000Z # "client call" meeting',
+        'inc 20260930T210000Z - 20261001T010000Z # late',
+    ],
+    '2026-10.data': [
+        'inc 20261012T080000Z - 20261012T093000Z # admin "say \\"hi\\""',
+        'inc 20261012T100000Z - 20261012T110000Z # # "notes about #1"',
+        'inc 20261013T090000Z - 20261013T100000Z # dev # "fix #42, \\"quoted\\""',
+        'inc 20261018T080000Z # dev',
+    ],
+}
+
+# Recorded "timew export :all" of DATA_FILES
+EXPORT_ALL = [
+    {'id': 6, 'start': '20260915T080000Z', 'end': '20260915T090000Z', \
+        'tags': ['client call', 'meeting']},
+    {'id': 5, 'start': '20260930T210000Z', 'end': '20261001T010000Z', 'tags': ['late']},
+    {'id': 4, 'start': '20261012T080000Z', 'end': '20261012T093000Z', \
+        'tags': ['admin', 'say "hi"']},
+    {'id': 3, 'start': '20261012T100000Z', 'end': '20261012T110000Z', \
+        'annotation': 'notes about #1'},
+    {'id': 2, 'start': '20261013T090000Z', 'end': '20261013T100000Z', 'tags': ['dev'], \
+        'annotation': 'fix #42, "quoted"'},
+    {'id': 1, 'start': '20261018T080000Z', 'tags': ['dev']},
+]
+
+
+@pytest.fixture
+def timew_db(tmp_path):
+    ''' Write the synthetic database, returns its path '''
+
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (tmp_path / 'timewarrior.cfg').write_text('', encoding='utf-8')
+
+    for file_name, lines in DATA_FILES.items():
+        (data_dir / file_name).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    return str(tmp_path)
+
+def test_export_all_matches_recorded_export(timew_db):
+    data_dir = os.path.join(timew_db, 'data')
+
+    assert twdata.export_intervals('all', data_dir) == EXPORT_ALL
+    assert list(twdata.iter_data_intervals('all', data_dir)) == EXPORT_ALL
+
+def test_range_keeps_database_ids(timew_db, local_timezone):
+    local_timezone('UTC')
+    data_dir = os.path.join(timew_db, 'data')
+    now = datetime(2026, 10, 14, 12, tzinfo=timezone.utc)
+
+    week = twdata.export_intervals('week', data_dir, now)
+
+    assert [ i['id'] for i in week ] == [4, 3, 2, 1]
+    assert week == EXPORT_ALL[2:]
+
+def test_month_range_includes_interval_from_previous_month(timew_db, local_timezone):
+    local_timezone('UTC')
+    data_dir = os.path.join(timew_db, 'data')
+    now = datetime(2026, 10, 14, 12, tzinfo=timezone.utc)
+
+    month = twdata.export_intervals('month', data_dir, now)
+
+    assert [ i['id'] for i in month ] == [5, 4, 3, 2, 1]
+
+def test_range_includes_intervals_started_months_before(tmp_path, local_timezone):
+    local_timezone('UTC')
+    now = datetime(2026, 10, 14, 12, tzinfo=timezone.utc)
+    (tmp_path / '2026-06.data').write_text( \
+        'inc 20260601T080000Z - 20260601T090000Z # old\n', encoding='utf-8')
+    (tmp_path / '2026-07.data').write_text( \
+        'inc 20260710T080000Z - 20261013T000000Z # long\n', encoding='utf-8')
+    (tmp_path / '2026-10.data').write_text( \
+        'inc 20261014T080000Z - 20261014T090000Z # dev\n', encoding='utf-8')
+
+    assert twdata.select_data_files(twdata.hint_range('week', now)[0], str(tmp_path)) \
+        == ['2026-07.data', '2026-10.data']
+    assert [ (i['id'], i['tags']) for i in twdata.export_intervals('week', str(tmp_path), now) ] \
+        == [(2, ['long']), (1, ['dev'])]
+
+def test_day_range_includes_open_interval_of_an_earlier_month(tmp_path, local_timezone):
+    local_timezone('UTC')
+    now = datetime(2026, 10, 14, 12, tzinfo=timezone.utc)
+    (tmp_path / '2026-08.data').write_text( \
+        'inc 20260801T080000Z - 20260801T090000Z # done\ninc 20260820T080000Z # open\n', \
+        encoding='utf-8')
+
+    assert list(twdata.iter_data_intervals('day', str(tmp_path), now)) \
+        == [{'id': 1, 'start': '20260820T080000Z', 'tags': ['open']}]
+
+@pytest.mark.parametrize('tag_text, tags, annotation', [
+    ('plain', ['plain'], ''),
+    ('a b', ['a', 'b'], ''),
+    ('"with space" x', ['with space', 'x'], ''),
+    ('"esc \\"q\\""', ['esc "q"'], ''),
+    ('tag#hash', ['tag#hash'], ''),
+    ('# "only annotation"', [], 'only annotation'),
+    ('a # "note # with hash"', ['a'], 'note # with hash'),
+])
+def test_split_tags(tag_text, tags, annotation):
+    assert twdata.split_tags(tag_text) == (tags, annotation)
+
+def test_parse_data_line_skips_other_lines():
+    assert twdata.parse_data_line('') is None
+    assert twdata.parse_data_line('# comment') is None
+    assert twdata.parse_data_line('inc 20261018T080000Z') == {'start': '20261018T080000Z'}
+
+@pytest.mark.skipif(shutil.which('timew') is None, reason='timew not installed')
+def test_export_matches_timew(timew_db):
+    environment = dict(os.environ, TIMEWARRIORDB=timew_db)
+    process = subprocess.run(['timew', 'export', ':all'], env=environment, \
+        capture_output=True, check=True)
+
+    assert twdata.export_intervals('all', os.path.join(timew_db, 'data')) \
+        == json.loads(process.stdout)
@@ -0,0 +1,42 @@
+'''
+    Parts of the GUI API that run without a window (snapshots, daemon)
+'''
+
+import os
+import sys
+import subprocess
+from datetime import datetime
+import twguiapi
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_daemon_import_does_not_load_gui():
+    check = "import sys, twdaemon; print('PySimpleGUI' in sys.modules, 'tkinter' in sys.modules)"
+    process = subprocess.run([sys.executable, '-c', check], cwd=REPO_DIR, \
+        capture_output=True, check=True, text=True)
+
+    assert process.stdout.split() == ['False', 'False']
+
+def test_row_keys_unique_for_shared_start_times():
+    start = datetime(2026, 10, 18, 8)
+    snapshot = twguiapi.TwSnapshot([
+        {'id': 4, 'starttime': datetime(2026, 10, 18, 7), 'stoptime': start, 'tag': []},
+        {'id': 3, 'starttime': start, 'stoptime': start, 'tag': []},
+        {'id': 2, 'starttime': start, 'stoptime': datetime(2026, 10, 18, 9), 'tag': []},
+        {'id': 1, 'starttime': start, 'tag': ['open']},
+    ])
+
+    assert snapshot.row_keys() == [datetime(2026, 10, 18, 7), start, (start, 1), (start, 2)]
+    assert snapshot.active_key() == (start, 2)
+    assert snapshot.filtered([0]).active_key() is None
+
+def test_row_keys_stay_when_the_open_interval_stops():
+    start = datetime(2026, 10, 18, 8)
+    snapshot = twguiapi.TwSnapshot([
+        {'id': 2, 'starttime': start, 'stoptime': start, 'tag': []},
+        {'id': 1, 'starttime': start, 'tag': []},
+    ])
+
+    stopped = snapshot.predict(close_at=datetime(2026, 10, 18, 9))
+
+    assert stopped.row_keys() == snapshot.row_keys()
@@ -0,0 +1,81 @@
+'''
+    Reports built from the daily rollups must match reports built from the intervals,
+    including across DST changes and the year boundary
+'''
+
+import os
+from datetime import datetime, timezone
+import pytest
+import twdata
+import twreports
+
+# UTC intervals around the Europe/Berlin year start and both DST changes of 2026
+DATA_FILES = {
+    '2025-12.data': [
+        'inc 20251231T223000Z - 20251231T233000Z # newyear',
+    ],
+    '2026-03.data': [
+        'inc 20260328T220000Z - 20260329T030000Z # night',
+        'inc 20260329T080000Z - 20260329T100000Z # dev',
+    ],
+    '2026-10.data': [
+        'inc 20261024T210000Z - 20261025T030000Z # night',
+        'inc 20261025T080000Z - 20261025T090000Z # dev meeting',
+        'inc 20261026T090000Z # dev',
+    ],
+}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    ''' Write the data files, returns the data directory '''
+
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+
+    for file_name, lines in DATA_FILES.items():
+        (data_path / file_name).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    return str(data_path)
+
+@pytest.mark.parametrize('today, duration', [
+    ('2026-10-25', 'day'),
+    ('2026-10-25', 'week'),
+    ('2026-10-26', 'yesterday'),
+    ('2026-10-26', 'week'),
+    ('2026-10-26', 'month'),
+    ('2026-03-29', 'day'),
+    ('2026-03-29', 'month'),
+    ('2026-01-01', 'day'),
+    ('2026-10-26', 'year'),
+])
+def test_rollup_matches_build_report(tmp_path, data_dir, local_timezone, today, duration):
+    local_timezone('Europe/Berlin')
+    now = datetime.fromisoformat(today + 'T12:00').astimezone()
+    now_epoch = int(now.timestamp())
+    range_start, range_end = twdata.hint_range(duration, now)
+
+    store = twdata.IntervalStore.from_export(twdata.export_intervals('all', data_dir, now))
+    expected = twreports.build_report(store, range_start, range_end, now_epoch)
+    rollup = twreports.RollupCache(str(tmp_path / 'rollup.json'), data_dir) \
+        .report(range_start, range_end, now_epoch)
+
+    assert rollup.total == expected.total
+    assert rollup.day_rows() == expected.day_rows()
+    assert sorted(rollup.tag_rows()) == sorted(expected.tag_rows())
+    assert sorted(rollup.tag_day_rows()) == sorted(expected.tag_day_rows())
+
+def test_year_starts_at_local_midnight(local_timezone):
+    local_timezone('Europe/Berlin')
+    range_start, range_end = twdata.hint_range('year', datetime(2026, 10, 18, 12).astimezone())
+
+    assert range_start == datetime(2025, 12, 31, 23, tzinfo=timezone.utc)
+    assert range_end == datetime(2026, 12, 31, 23, tzinfo=timezone.utc)
+
+def test_rollup_rejects_partial_days(tmp_path, data_dir, local_timezone):
+    local_timezone('Europe/Berlin')
+    rollup_cache = twreports.RollupCache(str(tmp_path / 'rollup.json'), data_dir)
+
+    with pytest.raises(ValueError):
+        rollup_cache.report(datetime(2026, 10, 25, 1).astimezone(), \
+            datetime(2026, 10, 26).astimezone())
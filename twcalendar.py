@@ -0,0 +1,555 @@
+#!/usr/bin/which python3
+'''
+    This script provides the calendar backends used for meeting tracking
+    iCalBuddy (macOS) and local .ics files, events are kept in an interval index
+    so "happening now" and range lookups do not scan every event
+    Author: Ben Mason
+'''
+
+__author__ = "Ben Mason"
+__copyright__ = "Copyright 2022"
+__version__ = "2.0.0"
+__email__ = "locutus@the-collective.net"
+__status__ = "Production"
+
+import os
+import logging
+from datetime import datetime, date, time, timedelta, timezone
+import config
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:
+    ZoneInfo = None
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+# Upper bound of generated occurrences per recurring event
+MAX_OCCURRENCES = 10000
+
+
+class CalendarEvent:
+    ''' Single calendar event (or occurrence of a recurring event) '''
+
+    __slots__ = ('summary', 'start', 'end', 'all_day')
+
+    def __init__(self, summary: str, start: datetime, end: datetime, all_day=False):
+        ''' initialize the class, start and end are timezone aware '''
+        self.summary = summary
+        self.start = start
+        self.end = end
+        self.all_day = all_day
+
+    def __repr__(self) -> str:
+        return "CalendarEvent(%r, %s, %s)" % (self.summary, self.start, self.end)
+
+    def entry(self) -> list:
+        ''' Return event as [name, start time, stop time] in local time '''
+
+        return [self.summary, self.start.astimezone().strftime('%H:%M'), \
+            self.end.astimezone().strftime('%H:%M')]
+
+class CalendarIndex:
+    '''
+    Events sorted by start time with the maximum end time of every subtree of the
+    implicit balanced tree over the sorted list (augmented interval tree)
+    Overlap queries take O(log n + k)
+    '''
+
+    def __init__(self, events: list):
+        ''' initialize the class '''
+        self.events = sorted(events, key=lambda event: (event.start, event.end))
+        self.starts = [ i.start.timestamp() for i in self.events ]
+        self.ends = [ i.end.timestamp() for i in self.events ]
+        self.max_end = list(self.ends)
+        self.build(0, len(self.events))
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def build(self, low: int, high: int) -> float:
+        ''' Compute subtree maximum end time, node of range [low, high) is its middle '''
+
+        if low >= high:
+            return float('-inf')
+
+        middle = (low + high) // 2
+        self.max_end[middle] = max(self.ends[middle], self.build(low, middle), \
+            self.build(middle + 1, high))
+
+        return self.max_end[middle]
+
+    def query(self, query_start: float, query_end: float, inclusive: bool) -> list:
+        ''' Return events with start before query_end and end after query_start '''
+
+        found = []
+        self.collect(0, len(self.events), query_start, query_end, inclusive, found)
+
+        return found
+
+    def collect(self, low, high, query_start, query_end, inclusive, found):
+        ''' Walk the implicit tree in order, pruning subtrees that can not overlap '''
+
+        if low >= high:
+            return
+
+        middle = (low + high) // 2
+        if self.max_end[middle] <= query_start:
+            return
+
+        self.collect(low, middle, query_start, query_end, inclusive, found)
+
+        start = self.starts[middle]
+        if start < query_end or (inclusive and start == query_end):
+            if self.ends[middle] > query_start:
+                found.append(self.events[middle])
+            self.collect(middle + 1, high, query_start, query_end, inclusive, found)
+
+    def at(self, when: datetime) -> list:
+        ''' Return events running at a point in time '''
+
+        timestamp = when.timestamp()
+
+        return self.query(timestamp, timestamp, True)
+
+    def between(self, range_start: datetime, range_end: datetime) -> list:
+        ''' Return events overlapping a time range '''
+        return self.query(range_start.timestamp(), range_end.timestamp(), False)
+
+def day_range(day=None) -> 'tuple[datetime,datetime]':
+    ''' Return local (start, end) of a day, default today '''
+
+    if day is None:
+        day = date.today()
+
+    day_start = datetime.combine(day, time()).astimezone()
+
+    return day_start, datetime.combine(day + timedelta(days=1), time()).astimezone()
+
+class CalendarProvider:
+    ''' Interface of the calendar backends '''
+
+    def events(self, range_start: datetime, range_end: datetime) -> list:
+        ''' Return CalendarEvent list overlapping the range '''
+        raise NotImplementedError
+
+    def index(self, range_start: datetime, range_end: datetime) -> CalendarIndex:
+        ''' Return interval index of the events in range '''
+        return CalendarIndex(self.events(range_start, range_end))
+
+class IcalBuddyProvider(CalendarProvider):
+    '''
+    Calendar events from the macOS iCalBuddy binary
+    Only todays events are available (eventsToday)
+    '''
+
+    def __init__(self, run_icalbuddy):
+        ''' initialize the class with the function running icalbuddy '''
+        self.run_icalbuddy = run_icalbuddy
+
+    @staticmethod
+    def parse_time(day: date, time_text: str):
+        ''' Convert icalbuddy time (15:00 or 3:00 PM) to a local datetime, None if not a time '''
+
+        for time_format in ('%H:%M', '%I:%M %p'):
+            try:
+                parsed = datetime.strptime(time_text.strip(), time_format).time()
+            except ValueError:
+                continue
+            return datetime.combine(day, parsed).astimezone()
+
+        return None
+
+    def events(self, range_start: datetime, range_end: datetime) -> list:
+        ''' Return todays events parsed from the " | " delimited icalbuddy output '''
+
+        today = date.today()
+        event_list = []
+
+        stdout = self.run_icalbuddy('eventsToday')
+
+        for i in stdout.split("\n"):
+            logging.debug("i: %s", i)
+            try:
+                tag, time_range = i.split(" | ")
+                starttime, endtime = time_range.split(' - ')
+            except ValueError:
+                if i != '':
+                    logging.error("Error with calendar entry %s", i)
+                continue
+
+            start = self.parse_time(today, starttime)
+            end = self.parse_time(today, endtime)
+            if start is None or end is None:
+                logging.error("Error with calendar entry %s", i)
+                continue
+            if end < start:
+                end += timedelta(days=1)
+
+            event_list.append(CalendarEvent(tag, start, end))
+
+        return [ i for i in event_list if i.start < range_end and i.end > range_start ]
+
+def unfold_ics_lines(ics_text: str) -> list:
+    ''' Join folded .ics content lines (continuation lines start with a space or tab) '''
+
+    lines = []
+
+    for line in ics_text.splitlines():
+        if line[:1] in (' ', '\t') and lines:
+            lines[-1] += line[1:]
+        elif line:
+            lines.append(line)
+
+    return lines
+
+def split_ics_property(line: str) -> 'tuple[str,dict,str]':
+    ''' Split "NAME;PARAM=VALUE:content" into name, parameters and value '''
+
+    head, _, value = line.partition(':')
+    name, *param_list = head.split(';')
+    params = {}
+
+    for param in param_list:
+        key, _, param_value = param.partition('=')
+        params[key.upper()] = param_value.strip('"')
+
+    return name.upper(), params, value
+
+def ics_zone(tzid: str):
+    ''' Return tzinfo for a TZID, local time if unknown '''
+
+    if tzid and ZoneInfo is not None:
+        try:
+            return ZoneInfo(tzid)
+        except (ZoneInfoNotFoundError, ValueError):
+            logging.debug("Unknown TZID %s, using local time", tzid)
+
+    return None
+
+def parse_ics_datetime(value: str, params: dict) -> 'tuple[datetime,bool]':
+    '''
+    Parse DATE or DATE-TIME property value
+    returns naive wall time in the event timezone and all day flag
+    '''
+
+    value = value.strip()
+
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8])), True
+
+    parsed = datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]), \
+        int(value[9:11]), int(value[11:13]), int(value[13:15]))
+
+    return parsed, False
+
+def attach_zone(wall_time: datetime, zone, utc: bool) -> datetime:
+    ''' Make naive wall time aware (UTC, TZID zone or local time) '''
+
+    if utc:
+        return wall_time.replace(tzinfo=timezone.utc)
+    if zone is not None:
+        return wall_time.replace(tzinfo=zone)
+
+    return wall_time.astimezone()
+
+def parse_ics_duration(value: str) -> timedelta:
+    ''' Parse RFC 5545 duration (P1W, PT1H30M, -P1D) '''
+
+    sign = -1 if value.startswith('-') else 1
+    value = value.lstrip('+-').lstrip('P')
+    days = seconds = 0
+    number = ''
+    in_time = False
+
+    for char in value:
+        if char.isdigit():
+            number += char
+        elif char == 'T':
+            in_time = True
+        else:
+            amount = int(number or 0)
+            number = ''
+            if char == 'W':
+                days += amount * 7
+            elif char == 'D':
+                days += amount
+            elif char == 'H' and in_time:
+                seconds += amount * 3600
+            elif char == 'M' and in_time:
+                seconds += amount * 60
+            elif char == 'S' and in_time:
+                seconds += amount
+
+    return sign * timedelta(days=days, seconds=seconds)
+
+def add_months(wall_time: datetime, months: int) -> datetime:
+    ''' Add months, returns None if the day does not exist in the target month '''
+
+    month_index = wall_time.month - 1 + months
+    try:
+        return wall_time.replace(year=wall_time.year + month_index // 12, \
+            month=month_index % 12 + 1)
+    except ValueError:
+        return None
+
+def nth_weekday(year: int, month: int, weekday: int, ordinal: int):
+    ''' Return day of month of the nth (negative counts from the end) weekday, or None '''
+
+    first = date(year, month, 1)
+    days_in_month = ((first.replace(day=28) + timedelta(days=4)).replace(day=1) \
+        - timedelta(days=1)).day
+    days = [ i for i in range(1, days_in_month + 1) \
+        if date(year, month, i).weekday() == weekday ]
+
+    if ordinal == 0 or abs(ordinal) > len(days):
+        return None
+
+    return days[ordinal - 1] if ordinal > 0 else days[ordinal]
+
+def expand_rrule(dtstart: datetime, rrule: dict, window_end: datetime) -> list:
+    '''
+    Generate naive wall time occurrence starts of an RRULE up to window_end
+    Supports FREQ DAILY/WEEKLY/MONTHLY/YEARLY with INTERVAL, COUNT, UNTIL, BYDAY and BYMONTHDAY
+    '''
+
+    frequency = rrule.get('FREQ', 'DAILY')
+    interval = int(rrule.get('INTERVAL', '1'))
+    count = int(rrule['COUNT']) if 'COUNT' in rrule else None
+    until = None
+    if 'UNTIL' in rrule:
+        until, _ = parse_ics_datetime(rrule['UNTIL'].rstrip('Z'), {})
+        if len(rrule['UNTIL']) == 8:
+            until += timedelta(days=1, seconds=-1)
+
+    by_day = []
+    for day_text in rrule.get('BYDAY', '').split(','):
+        if day_text:
+            ordinal = int(day_text[:-2]) if day_text[:-2] not in ('', '+') else 0
+            by_day.append((ordinal, WEEKDAYS.index(day_text[-2:])))
+    by_month_day = [ int(i) for i in rrule.get('BYMONTHDAY', '').split(',') if i ]
+
+    occurrences = []
+    period = 0
+
+    while len(occurrences) < MAX_OCCURRENCES:
+        candidates = []
+
+        if frequency == 'DAILY':
+            candidates = [dtstart + timedelta(days=period * interval)]
+        elif frequency == 'WEEKLY':
+            week_start = dtstart - timedelta(days=dtstart.weekday()) \
+                + timedelta(weeks=period * interval)
+            if by_day:
+                candidates = [ week_start + timedelta(days=i[1]) for i in sorted(by_day, \
+                    key=lambda day: day[1]) ]
+            else:
+                candidates = [dtstart + timedelta(weeks=period * interval)]
+        elif frequency == 'MONTHLY':
+            month_start = add_months(dtstart.replace(day=1), period * interval)
+            if by_day:
+                for ordinal, weekday in by_day:
+                    ordinals = [ordinal] if ordinal else range(1, 6)
+                    for i in ordinals:
+                        day = nth_weekday(month_start.year, month_start.month, weekday, i)
+                        if day is not None:
+                            candidates.append(month_start.replace(day=day))
+            elif by_month_day:
+                for day in by_month_day:
+                    try:
+                        candidates.append(month_start.replace(day=day))
+                    except ValueError:
+                        continue
+            else:
+                candidate = add_months(dtstart, period * interval)
+                candidates = [candidate] if candidate is not None else []
+        elif frequency == 'YEARLY':
+            try:
+                candidates = [dtstart.replace(year=dtstart.year + period * interval)]
+            except ValueError:
+                candidates = []
+        else:
+            logging.error("Unsupported RRULE frequency %s", frequency)
+            return [dtstart]
+
+        period_start = min(candidates) if candidates else None
+        for candidate in sorted(candidates):
+            if candidate < dtstart:
+                continue
+            if (until is not None and candidate > until) \
+                    or (count is not None and len(occurrences) >= count):
+                return occurrences
+            occurrences.append(candidate)
+
+        if period_start is not None and period_start > window_end:
+            break
+        if period > MAX_OCCURRENCES:
+            break
+        period += 1
+
+    return occurrences
+
+class IcsEvent:
+    ''' VEVENT as read from an .ics file, expanded to CalendarEvent occurrences on demand '''
+
+    def __init__(self):
+        ''' initialize the class '''
+        self.uid = ''
+        self.summary = ''
+        self.dtstart = None
+        self.duration = None
+        self.zone = None
+        self.utc = False
+        self.all_day = False
+        self.rrule = None
+        self.exdates = set()
+        self.recurrence_id = None
+        self.cancelled = False
+
+    def occurrences(self, window_start: datetime, window_end: datetime) -> list:
+        ''' Return CalendarEvent occurrences overlapping the window '''
+
+        if self.rrule is None:
+            starts = [self.dtstart]
+        else:
+            wall_end = window_end.astimezone(self.zone if self.zone else \
+                (timezone.utc if self.utc else None)).replace(tzinfo=None)
+            starts = expand_rrule(self.dtstart, self.rrule, wall_end)
+
+        event_list = []
+        for wall_start in starts:
+            if wall_start in self.exdates:
+                continue
+            start = attach_zone(wall_start, self.zone, self.utc)
+            end = attach_zone(wall_start + self.duration, self.zone, self.utc)
+            if start < window_end and end > window_start:
+                event_list.append(CalendarEvent(self.summary, start, end, self.all_day))
+
+        return event_list
+
+def parse_ics(ics_text: str) -> list:
+    ''' Parse the VEVENT components of an .ics file '''
+
+    event_list = []
+    event = None
+    dtend = None
+
+    for line in unfold_ics_lines(ics_text):
+        name, params, value = split_ics_property(line)
+
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event = IcsEvent()
+            dtend = None
+        elif event is None:
+            continue
+        elif name == 'END' and value.upper() == 'VEVENT':
+            if event.dtstart is not None and not event.cancelled:
+                if event.duration is None:
+                    if dtend is not None:
+                        event.duration = dtend - event.dtstart
+                    else:
+                        event.duration = timedelta(days=1) if event.all_day else timedelta()
+                event_list.append(event)
+            event = None
+        elif name == 'SUMMARY':
+            event.summary = value.replace('\\,', ',').replace('\\;', ';').replace('\\n', ' ')
+        elif name == 'UID':
+            event.uid = value
+        elif name == 'DTSTART':
+            event.dtstart, event.all_day = parse_ics_datetime(value, params)
+            event.utc = value.endswith('Z')
+            event.zone = ics_zone(params.get('TZID'))
+        elif name == 'DTEND':
+            dtend, _ = parse_ics_datetime(value, params)
+        elif name == 'DURATION':
+            event.duration = parse_ics_duration(value)
+        elif name == 'RRULE':
+            event.rrule = dict( i.split('=', 1) for i in value.split(';') if '=' in i )
+        elif name == 'EXDATE':
+            for exdate in value.split(','):
+                event.exdates.add(parse_ics_datetime(exdate, params)[0])
+        elif name == 'RECURRENCE-ID':
+            event.recurrence_id = parse_ics_datetime(value, params)[0]
+        elif name == 'STATUS' and value.upper() == 'CANCELLED':
+            event.cancelled = True
+
+    # Modified occurrences replace the generated occurrence of their series
+    for override in [ i for i in event_list if i.recurrence_id is not None ]:
+        for series in event_list:
+            if series.uid == override.uid and series.rrule is not None:
+                series.exdates.add(override.recurrence_id)
+
+    return event_list
+
+class IcsFileProvider(CalendarProvider):
+    '''
+    Calendar events from local .ics files
+    Parsed files are cached by mtime, expanded occurrences are cached per window
+    '''
+
+    def __init__(self, ics_files: list):
+        ''' initialize the class '''
+        self.ics_files = [ os.path.expanduser(i) for i in ics_files ]
+        self.parsed = {}
+        self.cached_index = None
+        self.cached_window = None
+        self.cached_signature = None
+
+    def file_events(self) -> 'tuple[list,tuple]':
+        ''' Return parsed events of all files and the mtime signature '''
+
+        event_list = []
+        signature = []
+
+        for ics_file in self.ics_files:
+            try:
+                mtime = os.stat(ics_file).st_mtime_ns
+            except OSError:
+                logging.error("Calendar file not found: %s", ics_file)
+                continue
+
+            signature.append((ics_file, mtime))
+            if ics_file not in self.parsed or self.parsed[ics_file][0] != mtime:
+                with open(ics_file, encoding=config.ENCODING) as ics_data:
+                    self.parsed[ics_file] = (mtime, parse_ics(ics_data.read()))
+
+            event_list.extend(self.parsed[ics_file][1])
+
+        return event_list, tuple(signature)
+
+    def index(self, range_start: datetime, range_end: datetime) -> CalendarIndex:
+        ''' Return interval index covering the range, reused while files are unchanged '''
+
+        event_list, signature = self.file_events()
+
+        if self.cached_index is not None and signature == self.cached_signature \
+                and self.cached_window[0] <= range_start and range_end <= self.cached_window[1]:
+            return self.cached_index
+
+        window_start = range_start - timedelta(days=1)
+        window_end = max(range_end, range_start + timedelta(days=config.ICS_EXPAND_DAYS))
+
+        occurrences = []
+        for event in event_list:
+            occurrences.extend(event.occurrences(window_start, window_end))
+
+        self.cached_index = CalendarIndex(occurrences)
+        self.cached_window = (window_start, window_end)
+        self.cached_signature = signature
+
+        return self.cached_index
+
+    def events(self, range_start: datetime, range_end: datetime) -> list:
+        ''' Return CalendarEvent list overlapping the range '''
+        return self.index(range_start, range_end).between(range_start, range_end)
+
+def calendar_provider(run_icalbuddy) -> CalendarProvider:
+    ''' Create the calendar backend selected in config.CALENDAR_PROVIDER '''
+
+    if config.CALENDAR_PROVIDER == 'ics':
+        return IcsFileProvider(config.ICS_CALENDAR_FILES)
+
+    return IcalBuddyProvider(run_icalbuddy)
+
+####### Start Main Function #############
+if __name__ == "__main__":
+    pass
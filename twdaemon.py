@@ -0,0 +1,354 @@
+#!/usr/bin/which python3
+'''
+    This script runs a headless service holding the TimeWarrior state in memory,
+    GUI instances, status bar widgets and scripts query and change it over a local
+    Unix domain socket instead of each running "timew"
+    Requests and replies are one JSON object per line
+    Author: Ben Mason
+'''
+
+__author__ = "Ben Mason"
+__copyright__ = "Copyright 2022"
+__version__ = "2.0.0"
+__email__ = "locutus@the-collective.net"
+__status__ = "Production"
+
+import os
+import sys
+import json
+import signal
+import socket
+import logging
+import tempfile
+import argparse
+import threading
+import socketserver
+from datetime import datetime, timezone, date
+import config
+import twdata
+from twguiapi import TwButtonLogic, CommandBatch
+from twwatch import DataWatcher
+
+OPERATIONS = ('ping', 'status', 'query', 'report', 'start', 'stop', 'track', 'modify', 'run')
+
+
+def daemon_socket_path() -> str:
+    ''' Return the socket path, DAEMON_SOCKET or a per user socket in the runtime directory '''
+
+    if config.DAEMON_SOCKET:
+        return config.DAEMON_SOCKET
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR', tempfile.gettempdir())
+
+    return os.path.join(runtime_dir, 'twgui-%d.sock' % os.getuid())
+
+def store_export(store: 'twdata.IntervalStore') -> list:
+    ''' Return the intervals of a store in "timew export" form '''
+
+    export_list = []
+
+    for row in range(len(store)):
+        export_item = {'id': store.ids[row], 'start': datetime.fromtimestamp(store.starts[row], \
+            timezone.utc).strftime(twdata.TW_DATE_FORMAT)}
+        if store.ends[row] != twdata.OPEN_END:
+            export_item['end'] = datetime.fromtimestamp(store.ends[row], \
+                timezone.utc).strftime(twdata.TW_DATE_FORMAT)
+        tags = store.tags(row)
+        if tags:
+            export_item['tags'] = tags
+        export_list.append(export_item)
+
+    return export_list
+
+class TwDaemon:
+    '''
+    State shared by all clients, the snapshot of today is kept in memory and
+    only read again after a command or when the data files changed
+    '''
+
+    def __init__(self):
+        ''' initialize the class '''
+        self.twbuttonlogic = TwButtonLogic()
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.snapshot_date = None
+        self.signature = None
+        self.export = None
+        self.refresh()
+
+    def write_event_value(self, key, value):
+        ''' Called by the DataWatcher in place of a window, the data files changed '''
+
+        logging.debug("daemon refresh on %s %s", key, value)
+
+        with self.lock:
+            self.refresh()
+
+    def refresh(self):
+        ''' Read the snapshot of today, caller holds the lock '''
+
+        # Taken before reading, a change while reading is picked up by the next request
+        self.signature = twdata.data_signature()
+        self.snapshot = self.twbuttonlogic.get_snapshot()
+        self.snapshot_date = date.today()
+        self.export = None
+
+    def request_values(self, args: dict) -> dict:
+        '''
+        Build the input field values the button handlers expect
+        raises ValueError if an argument is not a string
+        '''
+
+        for field in ('start', 'end', 'date', 'tag', 'duration'):
+            if not isinstance(args.get(field, ''), str):
+                raise ValueError(field + " must be a string")
+
+        return {'starttime': args.get('start', ''), 'stoptime': args.get('end', ''), \
+            'date': args.get('date', ''), 'taskdesc': args.get('tag', ''), \
+            'duration': args.get('duration', ''), 'timew_table': []}
+
+    def run(self, cli, result_display: str) -> dict:
+        ''' Run a command or batch and read the snapshot again, caller holds the lock '''
+
+        result, result_display, failed = self.twbuttonlogic.run_command_status(cli, result_display)
+        self.refresh()
+
+        return {'ok': not failed, 'result': result_display, \
+            'output': str(result, config.ENCODING, errors='replace')}
+
+    def handle(self, request: dict) -> dict:
+        ''' Answer one request '''
+
+        operation = request.get('op')
+        args = request.get('args', {})
+        cli = [config.CLI_BASE_COMMAND]
+
+        if operation not in OPERATIONS:
+            return {'ok': False, 'result': 'Unknown operation: ' + str(operation)}
+
+        if operation == 'ping':
+            return {'ok': True, 'result': 'pong'}
+
+        with self.lock:
+            # The snapshot holds one day, read again once the date rolled over or the
+            # database changed before the watcher noticed, clients cache replies on the
+            # signature they see
+            if self.snapshot_date != date.today() or self.signature != twdata.data_signature():
+                self.refresh()
+
+            if operation == 'status':
+                if self.snapshot is None:
+                    return {'ok': False, 'result': 'Unable to collect tasks'}
+                return {'ok': True, 'result': self.snapshot.tracking_text(), \
+                    'tags': self.snapshot.active_tags()}
+
+            if operation == 'query':
+                duration = args.get('range', 'day')
+                if duration == 'day' and self.snapshot is not None:
+                    if self.export is None:
+                        self.export = store_export(self.twbuttonlogic.interval_store)
+                    return {'ok': True, 'result': self.export}
+                return {'ok': True, \
+                    'result': store_export(self.twbuttonlogic.load_interval_store(duration))}
+
+            if operation == 'report':
+                report = self.twbuttonlogic.get_report(args.get('range', 'week'))
+                return {'ok': True, 'result': {'total': report.total, \
+                    'tags': report.tag_rows(), 'days': report.day_rows()}}
+
+            values = self.request_values(args)
+
+            if operation == 'start':
+                cli, result_display = self.twbuttonlogic.button_start(values, cli)
+            elif operation == 'stop':
+                cli, result_display = self.twbuttonlogic.button_stop(values, cli)
+            elif operation == 'track':
+                cli, result_display = self.twbuttonlogic.button_track(values, cli)
+            elif operation == 'modify':
+                if not isinstance(args.get('id', 1), int):
+                    raise ValueError("id must be a number")
+                cli = self.twbuttonlogic.run_modify_task('@' + str(args.get('id', 1)), values)
+                result_display = "Modified Task"
+            else:
+                # Commands of a GUI attached to the daemon, always run with CLI_BASE_COMMAND
+                cli = CommandBatch([ [config.CLI_BASE_COMMAND] + [ str(j) for j in i ] \
+                    for i in args.get('commands', []) ])
+                result_display = args.get('result', '')
+
+            return self.run(cli, result_display)
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    ''' One client connection, requests are answered until the client disconnects '''
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                reply = self.server.daemon.handle(request)
+            except (ValueError, AttributeError, TypeError, KeyError) as error:
+                reply = {'ok': False, 'result': 'Bad request: ' + str(error)}
+            except OSError as error:
+                reply = {'ok': False, 'result': 'Error: ' + str(error)}
+
+            self.wfile.write(json.dumps(reply).encode(config.ENCODING) + b'\n')
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    ''' Unix socket server, one thread per client '''
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, daemon: TwDaemon):
+        ''' initialize the class '''
+        self.daemon = daemon
+        socketserver.UnixStreamServer.__init__(self, socket_path, RequestHandler)
+
+class TwDaemonClient:
+    ''' Connection to a running daemon, reconnects once if the daemon was restarted '''
+
+    def __init__(self, socket_path=None, timeout=30.0):
+        ''' initialize the class '''
+        self.socket_path = socket_path if socket_path is not None else daemon_socket_path()
+        self.timeout = timeout
+        self.connection = None
+        self.reader = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        '''
+        Open the socket, raises OSError if no daemon is listening
+        A socket of another user is refused, the fallback location in /tmp is shared
+        '''
+
+        self.close()
+        if os.stat(self.socket_path).st_uid != os.getuid():
+            raise PermissionError("socket %s is owned by another user" % self.socket_path)
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.settimeout(self.timeout)
+        try:
+            self.connection.connect(self.socket_path)
+        except OSError:
+            self.close()
+            raise
+        self.reader = self.connection.makefile('rb')
+
+    def close(self):
+        ''' Close the socket '''
+
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def request(self, operation: str, **args) -> dict:
+        ''' Send a request and return the reply '''
+
+        message = json.dumps({'op': operation, 'args': args}).encode(config.ENCODING) + b'\n'
+
+        with self.lock:
+            for attempt in (1, 2):
+                try:
+                    if self.connection is None:
+                        self.connect()
+                    self.connection.sendall(message)
+                    reply = self.reader.readline()
+                    if reply:
+                        return json.loads(reply)
+                    raise ConnectionError("daemon closed the connection")
+                except OSError:
+                    self.close()
+                    if attempt == 2:
+                        raise
+
+        return None
+
+def daemon_running(socket_path=None) -> bool:
+    ''' Check if a daemon answers on the socket '''
+
+    client = TwDaemonClient(socket_path, timeout=2.0)
+
+    try:
+        return client.request('ping').get('ok', False)
+    except OSError:
+        return False
+    finally:
+        client.close()
+
+def serve(socket_path=None) -> int:
+    ''' Run the daemon until interrupted '''
+
+    socket_path = socket_path if socket_path is not None else daemon_socket_path()
+
+    if daemon_running(socket_path):
+        logging.error("Daemon already running on %s", socket_path)
+        return 1
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    daemon = TwDaemon()
+    server = DaemonServer(socket_path, daemon)
+    os.chmod(socket_path, 0o600)
+
+    watcher = None
+    if config.WATCH_DATA_FILES:
+        watcher = DataWatcher(daemon)
+        watcher.start()
+
+    logging.info("Daemon listening on %s", socket_path)
+
+    # Leave through the finally block on SIGTERM too, the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        server.server_close()
+        os.unlink(socket_path)
+
+    return 0
+
+def main() -> int:
+    ''' Main Function '''
+
+    parser = argparse.ArgumentParser(description='TimeWarrior GUI state daemon and client')
+    parser.add_argument('--socket', help='socket path (default DAEMON_SOCKET or runtime dir)')
+    parser.add_argument('operation', choices=('serve',) + OPERATIONS[:-1])
+    parser.add_argument('--tag', help='task tag for start and track')
+    parser.add_argument('--start', help='start time HH:MM')
+    parser.add_argument('--end', help='end time HH:MM')
+    parser.add_argument('--date', help='date YYYY-MM-DD for track')
+    parser.add_argument('--id', type=int, help='@id for modify')
+    parser.add_argument('--duration', help='duration H:MM for track')
+    parser.add_argument('--range', help='range hint for query and report (day, week, ...)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=config.LOGGING_LEVEL, format=config.LOGGING_FORMAT)
+
+    if args.operation == 'serve':
+        return serve(args.socket)
+
+    request_args = { i: getattr(args, i) for i in \
+        ('tag', 'start', 'end', 'date', 'id', 'duration', 'range') if getattr(args, i) is not None }
+
+    try:
+        reply = TwDaemonClient(args.socket).request(args.operation, **request_args)
+    except OSError as error:
+        print("Daemon not reachable: " + str(error), file=sys.stderr)
+        return 2
+
+    if isinstance(reply['result'], str):
+        print(reply['result'])
+    else:
+        print(json.dumps(reply['result'], indent=1))
+
+    return 0 if reply.get('ok') else 1
+
+####### Start Main Function #############
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,806 @@
+#!/usr/bin/which python3
+'''
+    This script reads the TimeWarrior database files directly so the GUI
+    does not need to run "timew export" for every refresh
+    Author: Ben Mason
+'''
+
+__author__ = "Ben Mason"
+__copyright__ = "Copyright 2022"
+__version__ = "2.0.0"
+__email__ = "locutus@the-collective.net"
+__status__ = "Production"
+
+import os
+import time
+import json
+import logging
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from datetime import datetime, timezone, timedelta
+import config
+
+TW_DATE_FORMAT = "%Y%m%dT%H%M%SZ"
+EPOCH = datetime(1970, 1, 1)
+# End time stored for open (active) intervals
+OPEN_END = -1
+
+# Pool used to load monthly data files in parallel, created on first use
+LOAD_POOL = {'executor': None, 'kind': None, 'workers': 0}
+
+# Range hints understood by the native reader, anything else is handed to "timew export"
+SUPPORTED_HINTS = ('day', 'yesterday', 'week', 'month', 'year', 'all')
+
+
+def timewarrior_db_path() -> str:
+    '''
+    Return the location of the TimeWarrior database
+    Honors the TIMEWARRIORDB environment variable the same way timew does
+    '''
+
+    db_path = os.environ.get('TIMEWARRIORDB')
+
+    if db_path is None:
+        db_path = os.path.expanduser('~/.timewarrior')
+
+        if not os.path.isdir(db_path):
+            xdg_data = os.environ.get('XDG_DATA_HOME', os.path.expanduser('~/.local/share'))
+            db_path = os.path.join(xdg_data, 'timewarrior')
+
+    return db_path
+
+def timewarrior_data_dir() -> str:
+    ''' Return the directory holding the monthly data files '''
+    return os.path.join(timewarrior_db_path(), 'data')
+
+def list_data_files(data_dir: str) -> list:
+    ''' Return sorted list of monthly data file names (YYYY-MM.data) '''
+
+    file_list = []
+
+    try:
+        dir_entries = os.listdir(data_dir)
+    except FileNotFoundError:
+        logging.error("TimeWarrior data directory not found: %s", data_dir)
+        return file_list
+
+    for file_name in dir_entries:
+        if len(file_name) == 12 and file_name.endswith('.data') and file_name[4] == '-' \
+                and file_name[:4].isdigit() and file_name[5:7].isdigit():
+            file_list.append(file_name)
+
+    file_list.sort()
+
+    return file_list
+
+def data_signature(db_path=None) -> tuple:
+    '''
+    Return the stat signature (name, mtime, size, inode) of the monthly data files and undo.data
+    Any change made by timew changes the signature, returns None if the database is not found
+    '''
+
+    if db_path is None:
+        db_path = timewarrior_db_path()
+
+    data_dir = os.path.join(db_path, 'data')
+    signature = []
+
+    try:
+        dir_stat = os.stat(data_dir)
+    except OSError:
+        return None
+
+    signature.append(('data', dir_stat.st_mtime_ns, dir_stat.st_size, dir_stat.st_ino))
+
+    for file_path in [ os.path.join(data_dir, i) for i in list_data_files(data_dir) ] \
+            + [ os.path.join(db_path, 'undo.data') ]:
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            continue
+        signature.append((os.path.basename(file_path), file_stat.st_mtime_ns, \
+            file_stat.st_size, file_stat.st_ino))
+
+    return tuple(signature)
+
+def split_tags(tag_text: str) -> 'tuple[list,str]':
+    '''
+    Split the tag section of a data file line into tags
+    Quoted tags may contain spaces and escaped quotes, an unquoted '#' starts the annotation
+    returns list of tags and annotation
+    '''
+
+    tags = []
+    annotation = ''
+    position = 0
+    text_len = len(tag_text)
+
+    while position < text_len:
+        char = tag_text[position]
+
+        if char == ' ':
+            position += 1
+        elif char == '"':
+            token = []
+            position += 1
+            while position < text_len and tag_text[position] != '"':
+                if tag_text[position] == '\\' and position + 1 < text_len:
+                    position += 1
+                token.append(tag_text[position])
+                position += 1
+            tags.append(''.join(token))
+            position += 1
+        elif char == '#' and (position + 1 == text_len or tag_text[position + 1] == ' '):
+            annotation = tag_text[position + 1:].strip()
+            if len(annotation) > 1 and annotation[0] == '"' and annotation[-1] == '"':
+                annotation = annotation[1:-1].replace('\\"', '"')
+            break
+        else:
+            end = tag_text.find(' ', position)
+            if end == -1:
+                end = text_len
+            tags.append(tag_text[position:end])
+            position = end
+
+    return tags, annotation
+
+def parse_data_line(line: str):
+    '''
+    Parse a single "inc" line of a monthly data file
+    returns dict in the same layout as a "timew export" entry (without id) or None
+    '''
+
+    line = line.strip()
+
+    if not line.startswith('inc '):
+        return None
+
+    interval_text, _, tag_text = line[4:].partition(' # ')
+    interval_parts = interval_text.split()
+
+    if not interval_parts:
+        return None
+
+    interval = {'start': interval_parts[0]}
+
+    if len(interval_parts) >= 3 and interval_parts[1] == '-':
+        interval['end'] = interval_parts[2]
+
+    tags, annotation = split_tags(tag_text)
+    if tags:
+        interval['tags'] = tags
+    if annotation:
+        interval['annotation'] = annotation
+
+    return interval
+
+def read_data_file(file_path: str) -> list:
+    ''' Read all intervals stored in one monthly data file '''
+
+    intervals = []
+
+    with open(file_path, encoding=config.ENCODING) as data_file:
+        for line in data_file:
+            interval = parse_data_line(line)
+            if interval is not None:
+                intervals.append(interval)
+
+    return intervals
+
+def hint_range(duration: str, now=None) -> 'tuple[datetime,datetime]':
+    '''
+    Convert a TimeWarrior range hint into a UTC (start, end) range
+    returns (None, None) for 'all'
+    '''
+
+    if now is None:
+        now = datetime.now().astimezone()
+
+    # Boundaries are local midnights of local dates, each with its own UTC offset (DST)
+    today = now.astimezone().date()
+
+    if duration == 'day':
+        first_day = today
+        last_day = today + timedelta(days=1)
+    elif duration == 'yesterday':
+        first_day = today - timedelta(days=1)
+        last_day = today
+    elif duration == 'week':
+        first_day = today - timedelta(days=(today.weekday() - config.TW_WEEKSTART) % 7)
+        last_day = first_day + timedelta(days=7)
+    elif duration == 'month':
+        first_day = today.replace(day=1)
+        last_day = (first_day + timedelta(days=32)).replace(day=1)
+    elif duration == 'year':
+        first_day = today.replace(month=1, day=1)
+        last_day = first_day.replace(year=first_day.year + 1)
+    elif duration == 'all':
+        return None, None
+    else:
+        raise ValueError("Unsupported range hint: " + duration)
+
+    range_start = datetime.combine(first_day, datetime.min.time()).astimezone()
+    range_end = datetime.combine(last_day, datetime.min.time()).astimezone()
+
+    return range_start.astimezone(timezone.utc), range_end.astimezone(timezone.utc)
+
+def reaches_range(file_path: str, range_start_text: str) -> bool:
+    ''' Return True if an interval of a data file is open or ends after range_start_text '''
+
+    with open(file_path, encoding=config.ENCODING) as data_file:
+        for line in data_file:
+            if not line.startswith('inc '):
+                continue
+
+            interval_parts = line[4:].partition(' # ')[0].split()
+            if len(interval_parts) < 3 or interval_parts[2] > range_start_text:
+                return True
+
+    return False
+
+def select_data_files(range_start: datetime, data_dir: str) -> list:
+    '''
+    Return data files needed for a range starting at range_start (None for all)
+    Intervals are filed by start month, the month before the range is read as well to
+    catch intervals running over the month boundary. Earlier files are added going back
+    while they hold an open interval or one ending in the range. Later files are needed
+    for the ids.
+    '''
+
+    file_list = list_data_files(data_dir)
+
+    if range_start is not None:
+        first_month = (range_start.replace(day=1) - timedelta(days=1)).strftime('%Y-%m.data')
+        first_index = len([ i for i in file_list if i < first_month ])
+        range_start_text = range_start.astimezone(timezone.utc).strftime(TW_DATE_FORMAT)
+
+        while first_index > 0 and reaches_range(os.path.join(data_dir, \
+                file_list[first_index - 1]), range_start_text):
+            first_index -= 1
+
+        file_list = file_list[first_index:]
+
+    return file_list
+
+def range_filter(duration: str, now=None):
+    '''
+    Return function testing if an interval overlaps the range of a hint
+    Fixed width timestamps compare correctly as strings
+    '''
+
+    range_start, range_end = hint_range(duration, now)
+
+    if range_start is None:
+        return lambda interval: True
+
+    range_start_text = range_start.strftime(TW_DATE_FORMAT)
+    range_end_text = range_end.strftime(TW_DATE_FORMAT)
+    now_text = datetime.now(timezone.utc).strftime(TW_DATE_FORMAT)
+
+    return lambda interval: interval['start'] < range_end_text \
+        and interval.get('end', now_text) > range_start_text
+
+def export_intervals(duration='day', data_dir=None, now=None) -> list:
+    '''
+    Native replacement for "timew export :<duration>"
+    Reads the monthly data files and returns the same list of dicts as the export JSON,
+    numbered with the same @id values (1 is the most recent interval)
+    '''
+
+    if data_dir is None:
+        data_dir = timewarrior_data_dir()
+
+    in_range = range_filter(duration, now)
+
+    intervals = []
+    for file_name in select_data_files(hint_range(duration, now)[0], data_dir):
+        intervals.extend(read_data_file(os.path.join(data_dir, file_name)))
+
+    intervals.sort(key=lambda interval: interval['start'])
+
+    no_of_intervals = len(intervals)
+    export_list = []
+
+    for index, interval in enumerate(intervals):
+        if not in_range(interval):
+            continue
+
+        export_item = {'id': no_of_intervals - index}
+        export_item.update(interval)
+        export_list.append(export_item)
+
+    logging.debug("export_intervals: %s intervals of %s", len(export_list), no_of_intervals)
+
+    return export_list
+
+def iter_data_intervals(duration='day', data_dir=None, now=None):
+    '''
+    Streaming variant of export_intervals yielding one export entry at a time
+    The files are read twice (count for the @ids, then parse) so memory stays flat,
+    relies on TimeWarrior keeping each data file sorted by start time
+    '''
+
+    if data_dir is None:
+        data_dir = timewarrior_data_dir()
+
+    in_range = range_filter(duration, now)
+    file_list = [ os.path.join(data_dir, i) for i in \
+        select_data_files(hint_range(duration, now)[0], data_dir) ]
+
+    no_of_intervals = 0
+    for file_path in file_list:
+        with open(file_path, encoding=config.ENCODING) as data_file:
+            no_of_intervals += sum(1 for line in data_file if line.startswith('inc '))
+
+    index = 0
+    for file_path in file_list:
+        with open(file_path, encoding=config.ENCODING) as data_file:
+            for line in data_file:
+                interval = parse_data_line(line)
+                if interval is None:
+                    continue
+
+                index += 1
+                if in_range(interval):
+                    export_item = {'id': no_of_intervals - index + 1}
+                    export_item.update(interval)
+                    yield export_item
+
+def iter_json_array(stream, chunk_size=65536):
+    '''
+    Yield the elements of a JSON array read incrementally from a text stream
+    Only the current partial element is buffered
+    '''
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    end_of_stream = False
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n[,]':
+            position += 1
+
+        if position < len(buffer):
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+                yield item
+                continue
+            except json.JSONDecodeError:
+                if end_of_stream:
+                    raise
+
+        if end_of_stream:
+            return
+
+        chunk = stream.read(chunk_size)
+        end_of_stream = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+def stream_tag_totals(intervals, now=None) -> dict:
+    '''
+    Aggregate tracked seconds per tag from a stream of export entries
+    Intervals are consumed one at a time and not kept, memory does not grow with the range
+    '''
+
+    if now is None:
+        now = int(datetime.now(timezone.utc).timestamp())
+
+    totals = {}
+
+    for interval in intervals:
+        start = parse_tw_timestamp(interval['start'])
+        end = parse_tw_timestamp(interval['end']) if 'end' in interval else now
+
+        for tag in interval.get('tags', ['']):
+            totals[tag] = totals.get(tag, 0) + end - start
+
+    return totals
+
+def days_from_civil(year: int, month: int, day: int) -> int:
+    ''' Return days since 1970-01-01 of a proleptic Gregorian date '''
+
+    year -= month <= 2
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+
+    return era * 146097 + day_of_era - 719468
+
+def parse_tw_timestamps(timestamps) -> array:
+    '''
+    Convert a batch of TimeWarrior UTC timestamps (20210520T130000Z) to int64 epoch seconds
+    Fixed width slicing instead of strptime, the date part is converted once per day
+    '''
+
+    day_seconds = {}
+    epochs = array('q')
+    append = epochs.append
+
+    for timestamp in timestamps:
+        day = timestamp[:8]
+        seconds = day_seconds.get(day)
+
+        if seconds is None:
+            if len(timestamp) != 16 or timestamp[8] != 'T' or timestamp[15] != 'Z':
+                raise ValueError("Invalid TimeWarrior timestamp: " + timestamp)
+            seconds = days_from_civil(int(day[0:4]), int(day[4:6]), int(day[6:8])) * 86400
+            day_seconds[day] = seconds
+
+        clock = int(timestamp[9:15])
+        append(seconds + clock // 10000 * 3600 + clock // 100 % 100 * 60 + clock % 100)
+
+    return epochs
+
+def parse_tw_timestamp(timestamp: str) -> int:
+    ''' Convert TimeWarrior UTC timestamp (20210520T130000Z) to epoch seconds '''
+    return parse_tw_timestamps((timestamp,))[0]
+
+def local_offsets(epochs) -> array:
+    '''
+    Return the local UTC offset in seconds for a batch of epoch seconds
+    Timezone transitions fall on 15 minute boundaries, the offset is looked up once per bucket
+    '''
+
+    bucket_offsets = {}
+    offsets = array('q')
+    append = offsets.append
+
+    for epoch in epochs:
+        bucket = epoch // 900
+        offset = bucket_offsets.get(bucket)
+
+        if offset is None:
+            offset = time.localtime(bucket * 900).tm_gmtoff
+            bucket_offsets[bucket] = offset
+
+        append(offset)
+
+    return offsets
+
+class IntervalView(Mapping):
+    '''
+    Read only dict view of one interval in an IntervalStore
+    Provides the keys of the task dicts used by the GUI (starttime, stoptime, duration, id, tag)
+    '''
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store: 'IntervalStore', row: int):
+        ''' initialize the class '''
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, key: str):
+        store = self.store
+        row = self.row
+
+        if key == 'starttime':
+            return EPOCH + timedelta(seconds=store.starts[row])
+        if key == 'stoptime' and store.ends[row] != OPEN_END:
+            return EPOCH + timedelta(seconds=store.ends[row])
+        if key == 'duration':
+            if store.ends[row] == OPEN_END:
+                return 'Active'
+            return timedelta(seconds=store.ends[row] - store.starts[row])
+        if key == 'id':
+            return store.ids[row]
+        if key == 'tag':
+            return store.tags(row) or ['']
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        if self.store.ends[self.row] == OPEN_END:
+            return iter(('starttime', 'duration', 'id', 'tag'))
+        return iter(('starttime', 'stoptime', 'duration', 'id', 'tag'))
+
+    def __len__(self) -> int:
+        return 4 if self.store.ends[self.row] == OPEN_END else 5
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+class IntervalStore:
+    '''
+    Columnar store of intervals sorted by start time
+    Start and end are int64 epoch seconds (UTC), tags are interned to integer ids and kept
+    as one flat array with per row offsets. @ids of an export are consecutive, so the row of
+    an @id is computed, an id to row index is only built if they are not
+    '''
+
+    def __init__(self):
+        ''' initialize the class '''
+        self.starts = array('q')
+        self.ends = array('q')
+        self.ids = array('q')
+        self.tag_offsets = array('q', [0])
+        self.tag_ids = array('l')
+        self.tag_names = []
+        self.tag_index = {}
+        self.id_rows = None
+        self.max_duration = 0
+        self.masks = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def intern_tag(self, tag: str) -> int:
+        ''' Return integer id of a tag, adding it to the tag table if new '''
+
+        tag_id = self.tag_index.get(tag)
+
+        if tag_id is None:
+            tag_id = len(self.tag_names)
+            self.tag_names.append(tag)
+            self.tag_index[tag] = tag_id
+
+        return tag_id
+
+    def append(self, start: int, end: int, tags: list, interval_id: int):
+        ''' Add interval, must be appended in start time order '''
+
+        if self.id_rows is None and self.ids and interval_id != self.ids[-1] - 1:
+            self.id_rows = { self.ids[i]: i for i in range(len(self.ids)) }
+        if self.id_rows is not None:
+            self.id_rows[interval_id] = len(self.starts)
+
+        self.starts.append(start)
+        self.ends.append(end)
+        self.ids.append(interval_id)
+        self.tag_ids.extend([ self.intern_tag(i) for i in tags if i != '' ])
+        self.tag_offsets.append(len(self.tag_ids))
+
+        if end != OPEN_END and end - start > self.max_duration:
+            self.max_duration = end - start
+
+    @classmethod
+    def from_export(cls, task_list: list) -> 'IntervalStore':
+        ''' Build store from "timew export" entries '''
+
+        store = cls()
+
+        task_list = sorted(task_list, key=lambda task: task['start'])
+        starts = parse_tw_timestamps([ i['start'] for i in task_list ])
+        ends = parse_tw_timestamps([ i['end'] for i in task_list if 'end' in i ])
+        end_index = 0
+
+        for task_item, start in zip(task_list, starts):
+            if 'end' in task_item:
+                end = ends[end_index]
+                end_index += 1
+            else:
+                end = OPEN_END
+            store.append(start, end, task_item.get('tags', []), task_item['id'])
+
+        return store
+
+    @classmethod
+    def from_stream(cls, intervals) -> 'IntervalStore':
+        '''
+        Build store from an iterable of export entries consumed one at a time,
+        only the compact columns are kept in memory
+        '''
+
+        store = cls()
+        in_order = True
+
+        for task_item in intervals:
+            start = parse_tw_timestamp(task_item['start'])
+            if 'end' in task_item:
+                end = parse_tw_timestamp(task_item['end'])
+            else:
+                end = OPEN_END
+
+            if store.starts and start < store.starts[-1]:
+                in_order = False
+            store.append(start, end, task_item.get('tags', []), task_item['id'])
+
+        if not in_order:
+            store = store.sorted()
+
+        return store
+
+    def sorted(self) -> 'IntervalStore':
+        ''' Return copy of the store sorted by start time '''
+
+        store = IntervalStore()
+
+        for row in sorted(range(len(self.starts)), key=lambda row: self.starts[row]):
+            store.append(self.starts[row], self.ends[row], self.tags(row), self.ids[row])
+
+        return store
+
+    def tag_id_list(self, row: int) -> array:
+        ''' Return interned tag ids of a row '''
+        return self.tag_ids[self.tag_offsets[row]:self.tag_offsets[row + 1]]
+
+    def tags(self, row: int) -> list:
+        ''' Return tag names of a row '''
+        return [ self.tag_names[i] for i in self.tag_id_list(row) ]
+
+    def row_for_id(self, interval_id: int):
+        ''' Return row of an @id in O(1), None if not in store '''
+        if self.id_rows is not None:
+            return self.id_rows.get(interval_id)
+
+        if self.ids and 0 <= self.ids[0] - interval_id < len(self.ids):
+            return self.ids[0] - interval_id
+
+        return None
+
+    def views(self, first_row=0, last_row=None) -> list:
+        ''' Return dict views of a range of rows '''
+
+        if last_row is None:
+            last_row = len(self.starts)
+
+        return [ IntervalView(self, i) for i in range(first_row, last_row) ]
+
+    def tag_masks(self) -> list:
+        '''
+        Return the tags of each row as a bitset of tag ids (int)
+        Built on first use and extended for appended rows
+        '''
+
+        for row in range(len(self.masks), len(self.starts)):
+            mask = 0
+            for tag_id in self.tag_ids[self.tag_offsets[row]:self.tag_offsets[row + 1]]:
+                mask |= 1 << tag_id
+            self.masks.append(mask)
+
+        return self.masks
+
+    def tag_mask(self, tags) -> int:
+        ''' Return bitset of the known tags in a list, unknown tags are left out '''
+
+        mask = 0
+
+        for tag in tags:
+            if tag in self.tag_index:
+                mask |= 1 << self.tag_index[tag]
+
+        return mask
+
+    def filter_rows(self, all_of=(), any_of=(), none_of=(), rows=None) -> list:
+        '''
+        Return rows whose tags include all of all_of, at least one of any_of (if given)
+        and none of none_of, the tests are bitset operations on the tag ids
+        '''
+
+        if rows is None:
+            rows = range(len(self.starts))
+
+        if any(i not in self.tag_index for i in all_of):
+            return []
+
+        all_mask = self.tag_mask(all_of)
+        any_mask = self.tag_mask(any_of)
+        none_mask = self.tag_mask(none_of)
+        masks = self.tag_masks()
+
+        if any_of and not any_mask:
+            return []
+
+        return [ i for i in rows if masks[i] & all_mask == all_mask \
+            and (not any_of or masks[i] & any_mask) and not masks[i] & none_mask ]
+
+    def find(self, interval_id: int):
+        ''' Return dict view of an @id, None if not in store '''
+
+        row = self.row_for_id(interval_id)
+
+        return None if row is None else IntervalView(self, row)
+
+    def rows_in_range(self, range_start: int, range_end: int, now=None) -> range:
+        '''
+        Return candidate rows for [range_start, range_end) epoch seconds
+        Rows are sorted by start, a bisect widened by the longest interval finds the window
+        '''
+
+        longest = self.max_duration
+
+        # Only the latest interval can be open
+        if self.ends and self.ends[-1] == OPEN_END:
+            if now is None:
+                now = int(datetime.now(timezone.utc).timestamp())
+            longest = max(longest, now - self.starts[-1])
+
+        return range(bisect_left(self.starts, range_start - longest), \
+            bisect_left(self.starts, range_end))
+
+def read_month_columns(file_path: str) -> tuple:
+    '''
+    Parse one monthly data file into sorted columns, runs in a pool worker
+    returns start and end epoch arrays as bytes and the tag tuples
+    '''
+
+    intervals = read_data_file(file_path)
+    intervals.sort(key=lambda interval: interval['start'])
+
+    starts = parse_tw_timestamps([ i['start'] for i in intervals ])
+    closed_ends = iter(parse_tw_timestamps([ i['end'] for i in intervals if 'end' in i ]))
+    ends = array('q', [ next(closed_ends) if 'end' in i else OPEN_END for i in intervals ])
+    tags = [ tuple(i.get('tags', ())) for i in intervals ]
+
+    return starts.tobytes(), ends.tobytes(), tags
+
+def load_pool(kind: str, workers: int):
+    ''' Return the shared process or thread pool, recreated if the settings changed '''
+
+    # Imported on first use, loading multiprocessing slows down start up
+    # pylint: disable=import-outside-toplevel
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    if LOAD_POOL['executor'] is None or LOAD_POOL['kind'] != kind \
+            or LOAD_POOL['workers'] != workers:
+        if LOAD_POOL['executor'] is not None:
+            LOAD_POOL['executor'].shutdown(wait=False)
+
+        if kind == 'thread':
+            LOAD_POOL['executor'] = ThreadPoolExecutor(max_workers=workers)
+        else:
+            # Spawned, the GUI process runs threads and must not fork
+            LOAD_POOL['executor'] = ProcessPoolExecutor(max_workers=workers, \
+                mp_context=multiprocessing.get_context('spawn'))
+        LOAD_POOL['kind'] = kind
+        LOAD_POOL['workers'] = workers
+
+    return LOAD_POOL['executor']
+
+def load_store_parallel(duration='day', data_dir=None, workers=None, kind=None, \
+        now=None) -> IntervalStore:
+    '''
+    Load the intervals of a range hint into an IntervalStore, parsing the monthly data files
+    on a process (or thread) pool and merging the sorted per file columns in file order
+    '''
+
+    if data_dir is None:
+        data_dir = timewarrior_data_dir()
+    if workers is None:
+        workers = config.DATA_LOAD_WORKERS
+    if kind is None:
+        kind = config.DATA_LOAD_POOL
+
+    range_start, range_end = hint_range(duration, now)
+    file_paths = [ os.path.join(data_dir, i) for i in select_data_files(range_start, data_dir) ]
+
+    if workers > 1 and len(file_paths) > 1:
+        month_columns = list(load_pool(kind, workers).map(read_month_columns, file_paths))
+    else:
+        month_columns = [ read_month_columns(i) for i in file_paths ]
+
+    now_epoch = int(datetime.now(timezone.utc).timestamp())
+    if range_start is not None:
+        start_epoch = int(range_start.timestamp())
+        end_epoch = int(range_end.timestamp())
+
+    month_arrays = []
+    for starts_bytes, ends_bytes, tags in month_columns:
+        starts = array('q')
+        starts.frombytes(starts_bytes)
+        ends = array('q')
+        ends.frombytes(ends_bytes)
+        month_arrays.append((starts, ends, tags))
+
+    no_of_intervals = sum(len(i[0]) for i in month_arrays)
+    store = IntervalStore()
+    index = 0
+
+    for starts, ends, tags in month_arrays:
+        for start, end, interval_tags in zip(starts, ends, tags):
+            index += 1
+            if range_start is not None and (start >= end_epoch \
+                    or (now_epoch if end == OPEN_END else end) <= start_epoch):
+                continue
+            store.append(start, end, interval_tags, no_of_intervals - index + 1)
+
+    return store
+
+####### Start Main Function #############
+if __name__ == "__main__":
+    pass
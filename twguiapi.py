@@ -10,18 +10,76 @@ __version__ = "2.0.0"
 __email__ = "locutus@the-collective.net"
 __status__ = "Production"
 
+import os
 import subprocess
 import json
+import codecs
+import time
+import threading
 import logging
 from datetime import datetime, timezone, timedelta
-import PySimpleGUI as sg
 import config
+import twdata
+import twreports
+import twtags
+import twperf
+from twworker import WORKER_EVENT, WORKER_ERROR_EVENT
 
 
 def utc_to_local(utc_dt: datetime) -> datetime:
     ''' Convert datetime object to local time from UTC '''
     return utc_dt.replace(tzinfo=timezone.utc).astimezone(tz=None)
 
+def local_input_to_utc(date_text: str, time_text: str, now: datetime) -> datetime:
+    '''
+    Convert "YYYY-MM-DD" and "HH:MM" input fields (local time) to naive UTC like the task
+    start times, an empty time is now and an empty date is today
+    '''
+
+    if time_text == '':
+        return now
+
+    if date_text == '':
+        date_text = utc_to_local(now).strftime('%Y-%m-%d')
+
+    local_dt = datetime.strptime(date_text + ' ' + time_text, '%Y-%m-%d %H:%M')
+
+    return local_dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+def predicted_task(start: datetime, end, tags: list) -> dict:
+    ''' Return a task dict for an interval that is expected to be created by a command '''
+
+    task_item = {'starttime': start, 'id': 0, 'tag': tags or ['']}
+
+    if end is None:
+        task_item['duration'] = 'Active'
+    else:
+        task_item['stoptime'] = end
+        task_item['duration'] = end - start
+
+    return task_item
+
+def parse_tag_filter(filter_text: str) -> 'tuple[list,list,list]':
+    '''
+    Parse a comma separated tag filter, "+tag" is required, "-tag" is excluded and
+    any other tag has to match at least one
+    returns all of, any of and none of tag lists
+    '''
+
+    all_of = []
+    any_of = []
+    none_of = []
+
+    for tag in [ i.strip() for i in filter_text.split(',') ]:
+        if tag.startswith('+') and len(tag) > 1:
+            all_of.append(tag[1:].strip())
+        elif tag.startswith('-') and len(tag) > 1:
+            none_of.append(tag[1:].strip())
+        elif tag != '':
+            any_of.append(tag)
+
+    return all_of, any_of, none_of
+
 def list_to_str(orig_list: list) -> str:
     ''' Convert List into Comma sperated String '''
     return ', '.join(orig_list)
@@ -32,6 +90,8 @@ def error_popup(popup_message: str) -> 'tuple[str,str]':
     Returns blank cli and 'Error' return message
     '''
 
+    import PySimpleGUI as sg # pylint: disable=import-outside-toplevel
+
     sg.popup("ERROR: " + popup_message)
 
     cli = ""
@@ -39,27 +99,346 @@ def error_popup(popup_message: str) -> 'tuple[str,str]':
 
     return cli, results_display
 
-def execute_cli(cli: str) -> str:
-    ''' Execute commands on CLI returns STDOUT '''
+def execute_cli_status(cli: list) -> 'tuple[int,bytes,bytes]':
+    ''' Execute commands on CLI returns exit code, STDOUT and STDERR '''
 
     logging.debug("cli: %s", cli)
 
-    process = subprocess.Popen(cli, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout, stderr = process.communicate()
+    with twperf.span('subprocess', ' '.join(cli)) as perf_record:
+        process = subprocess.Popen(cli, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        perf_record['exit_code'] = process.returncode
+        perf_record['bytes'] = len(stdout) + len(stderr)
 
     logging.debug("stdout: %s", stdout)
     logging.debug("stderr: %s", stderr)
 
+    return process.returncode, stdout, stderr
+
+def execute_cli(cli: str) -> str:
+    ''' Execute commands on CLI returns STDOUT '''
+
+    _, stdout, _ = execute_cli_status(cli)
+
     return stdout
 
+class CountingReader:
+    ''' Text stream decoding a byte pipe incrementally, counts the bytes read '''
+
+    def __init__(self, pipe):
+        ''' initialize the class '''
+        self.pipe = pipe
+        self.bytes = 0
+        self.decoder = codecs.getincrementaldecoder(config.ENCODING)()
+
+    def read(self, size: int) -> str:
+        ''' Read up to size bytes, returns '' only at the end of the pipe '''
+
+        text = ''
+
+        while not text:
+            chunk = self.pipe.read(size)
+            self.bytes += len(chunk)
+            text = self.decoder.decode(chunk, final=not chunk)
+            if not chunk:
+                break
+
+        return text
+
+def stream_export(duration: str):
+    '''
+    Run "timew export" and yield intervals while the output is read from the pipe
+    Memory stays bounded by one interval instead of the whole export
+    '''
+
+    cli = [config.CLI_BASE_COMMAND, 'export', ':'+duration]
+    logging.debug("cli: %s", cli)
+
+    with twperf.span('subprocess', ' '.join(cli)) as perf_record:
+        process = subprocess.Popen(cli, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        stdout = CountingReader(process.stdout)
+
+        try:
+            yield from twdata.iter_json_array(stdout)
+        finally:
+            _, stderr = process.communicate()
+            logging.debug("stderr: %s", stderr)
+            perf_record['exit_code'] = process.returncode
+            perf_record['bytes'] = stdout.bytes + len(stderr)
+
+        # Fails like the buffered export, a failed export is never taken as empty
+        if process.returncode != 0:
+            raise ValueError("%s failed (exit %s): %s" % (' '.join(cli), process.returncode, \
+                str(stderr, config.ENCODING, errors='replace').strip()))
+
+class CommandBatch:
+    '''
+    Several TimeWarrior commands run back to back as one action
+    Execution stops on the first failing command
+    '''
+
+    def __init__(self, commands=None):
+        ''' initialize the class '''
+        self.commands = []
+
+        for cli in commands or []:
+            self.add(cli)
+
+    def __bool__(self) -> bool:
+        return len(self.commands) > 0
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def add(self, cli: list):
+        ''' Queue a command '''
+        self.commands.append(cli)
+
+    def run(self) -> 'tuple[bytes,str]':
+        '''
+        Run queued commands in order
+        returns combined STDOUT/STDERR and None or an error status for the failed command
+        '''
+
+        output = []
+        status = None
+
+        for cli in self.commands:
+            returncode, stdout, stderr = execute_cli_status(cli)
+            output.extend([ i for i in (stdout, stderr) if i ])
+
+            if returncode != 0:
+                status = "Failed: " + ' '.join(cli) + " (exit " + str(returncode) + ")"
+                logging.error("Command batch stopped: %s", status)
+                break
+
+        return b''.join(output), status
+
+class IntervalCache:
+    '''
+    Cache of parsed interval stores keyed on the range and the stat signature of the
+    TimeWarrior database files, an unchanged database never triggers a re-export
+    '''
+
+    def __init__(self):
+        ''' initialize the class '''
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(duration: str) -> tuple:
+        ''' Build cache key, range hints are relative to today so the date is included '''
+
+        signature = twdata.data_signature()
+        if signature is None:
+            return None
+
+        return (duration, datetime.now().date(), signature)
+
+    def lookup(self, key: tuple):
+        ''' Return cached interval store or None '''
+
+        with self.lock:
+            interval_store = self.entries.get(key) if key is not None else None
+            if interval_store is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            hits, misses = self.hits, self.misses
+
+        logging.info("interval cache %s (hits: %s misses: %s)", \
+            'hit' if interval_store is not None else 'miss', hits, misses)
+
+        return interval_store
+
+    def store(self, key: tuple, interval_store: 'twdata.IntervalStore'):
+        ''' Store interval store, only the latest signature per range is kept '''
+
+        if key is None:
+            return
+
+        with self.lock:
+            for old_key in [ i for i in self.entries if i[0] == key[0] ]:
+                del self.entries[old_key]
+
+            self.entries[key] = interval_store
+
+    def invalidate(self):
+        ''' Drop all cached interval stores '''
+
+        with self.lock:
+            self.entries = {}
+
+class TwSnapshot:
+    '''
+    State of the TimeWarrior database from a single fetch
+    Holds the tasks in range and the open interval (no end) if one is tracking,
+    store is the interval store the tasks are views of (None for predicted snapshots)
+    '''
+
+    def __init__(self, tasks: list, store=None):
+        ''' initialize the class '''
+        self.tasks = tasks
+        self.store = store
+        self.active_task = None
+        self.active_index = None
+        self.keys = None
+
+        for index, task_item in enumerate(tasks):
+            if 'stoptime' not in task_item.keys():
+                self.active_task = task_item
+                self.active_index = index
+
+    def active_tags(self) -> list:
+        ''' Return tags of the open interval '''
+
+        if self.active_task is None:
+            return []
+
+        return [ i for i in self.active_task['tag'] if i != '' ]
+
+    def elapsed(self) -> timedelta:
+        ''' Return time elapsed on the open interval '''
+
+        if self.active_task is None:
+            return None
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+        return now - self.active_task['starttime']
+
+    def active_timer(self) -> str:
+        ''' Return the active tags formatted like the output of bare "timew" '''
+
+        if self.active_task is None:
+            return "no active time tracking"
+
+        return ' '.join(self.active_tags())
+
+    def row_keys(self) -> list:
+        '''
+        Return key identifying the interval of each table row (start time)
+        Intervals sharing a start time are keyed (start time, n) from the second one on
+        '''
+
+        if self.keys is None:
+            self.keys = []
+            seen = {}
+            for task_item in self.tasks:
+                count = seen.get(task_item['starttime'], 0)
+                seen[task_item['starttime']] = count + 1
+                self.keys.append(task_item['starttime'] if count == 0 \
+                    else (task_item['starttime'], count))
+
+        return self.keys
+
+    def active_key(self):
+        ''' Return row key of the open interval, None if it is not in the table '''
+
+        if self.active_index is None:
+            return None
+
+        return self.row_keys()[self.active_index]
+
+    def task_ids(self) -> list:
+        ''' Return TimeWarrior @id of each table row '''
+        return [ i['id'] for i in self.tasks ]
+
+    def table_row(self, index: int) -> list:
+        ''' Return table row of one task, built on demand for the virtual table '''
+
+        task_item = self.tasks[index]
+
+        if task_item is self.active_task:
+            return self.active_row()[1]
+
+        return [ list_to_str(task_item['tag']), str(task_item['duration']) ]
+
+    def tracking_text(self) -> str:
+        ''' Return active tags with the elapsed time for the "Current Tracking" field '''
+
+        if self.active_task is None:
+            return self.active_timer()
+
+        return self.active_timer() + " (" + str(self.elapsed()) + ")"
+
+    def filtered(self, rows: list) -> 'TwSnapshot':
+        '''
+        Return snapshot showing only some of the tasks (by index)
+        The open interval stays the active task even if it is filtered out of the table
+        '''
+
+        snapshot = TwSnapshot([ self.tasks[i] for i in rows ])
+        snapshot.active_task = self.active_task
+        snapshot.active_index = None
+
+        if self.active_index is not None and self.active_index in rows:
+            snapshot.active_index = rows.index(self.active_index)
+
+        return snapshot
+
+    def predict(self, close_at=None, remove_id=None, add=None) -> 'TwSnapshot':
+        '''
+        Return the snapshot expected after a command, used until the real state is read
+        close_at closes the open interval, remove_id drops an interval and add is a task dict,
+        @ids are renumbered in start order the way TimeWarrior does
+        '''
+
+        tasks = []
+
+        for task_item in self.tasks:
+            if task_item['id'] == remove_id:
+                continue
+
+            task_item = dict(task_item)
+            if close_at is not None and 'stoptime' not in task_item:
+                task_item['stoptime'] = close_at
+                task_item['duration'] = close_at - task_item['starttime']
+            tasks.append(task_item)
+
+        if add is not None:
+            tasks.append(add)
+
+        tasks.sort(key=lambda task_item: task_item['starttime'])
+        first_id = min([ i['id'] for i in self.tasks ], default=1)
+
+        for index, task_item in enumerate(reversed(tasks)):
+            task_item['id'] = first_id + index
+
+        return TwSnapshot(tasks)
+
+    def active_row(self) -> 'tuple[int,list]':
+        '''
+        Return table index and table row of the open interval with the current elapsed time
+        Computed locally, no TimeWarrior command is run
+        '''
+
+        if self.active_task is None:
+            return None, None
+
+        return self.active_index, [ list_to_str(self.active_task['tag']), \
+            'Active ' + str(self.elapsed()) ]
+
 class TwButtonLogic:
     ''' This class hold the logic and actions for selected buttons '''
 
     no_of_tasks_tracked = 0
     todays_tasks = None
+    interval_store = None
+    # Buttons whose data is read by prepare_button on the worker before the handler runs
+    PREPARED_EVENTS = ('Report', 'Gaps')
 
     def __init__(self):
         ''' initialize the class '''
+        self.interval_cache = IntervalCache()
+        self.rollup_cache = None
+        self.tag_index = None
+        self.tag_filter = ([], [], [])
+        self.daemon_client = None
+        self.worker = None
 
     @staticmethod
     def get_active_timer() -> str:
@@ -79,21 +458,90 @@ class TwButtonLogic:
         return result
 
     @staticmethod
-    def run_modify_task(taskid: str, values: dict):
-        ''' Run modification task commands '''
+    def run_modify_task(taskid: str, values: dict) -> CommandBatch:
+        ''' Build modification task commands '''
         logging.debug(values)
 
+        batch = CommandBatch()
+
         if values['starttime'] != "":
             modify_time = values['starttime']
             modify_mode = "start"
-            execute_cli([config.CLI_BASE_COMMAND, 'modify', modify_mode, taskid, modify_time])
+            batch.add([config.CLI_BASE_COMMAND, 'modify', modify_mode, taskid, modify_time])
 
         if 'stoptime' in values.keys() and values['stoptime'] != "":
             modify_time = values['stoptime']
             modify_mode = "end"
-            execute_cli([config.CLI_BASE_COMMAND, 'modify', modify_mode, taskid, modify_time])
+            batch.add([config.CLI_BASE_COMMAND, 'modify', modify_mode, taskid, modify_time])
+
+        return batch
+
+    def load_interval_store(self, duration='day') -> 'twdata.IntervalStore':
+        '''
+        Load the intervals of a range into an IntervalStore
+        Reused from the interval cache while the database is unchanged
+        '''
+
+        interval_store = None
+
+        if config.INTERVAL_CACHE_ENABLE:
+            cache_key = self.interval_cache.cache_key(duration)
+            interval_store = self.interval_cache.lookup(cache_key)
+
+        daemon_client = self.daemon_client
+
+        if interval_store is None and daemon_client is not None:
+            # Attached to the state daemon, intervals are answered from its memory
+            try:
+                reply = daemon_client.request('query', range=duration)
+            except OSError as error:
+                self.detach_daemon(error)
+            else:
+                if reply.get('ok'):
+                    interval_store = twdata.IntervalStore.from_export(reply['result'])
+                else:
+                    # Read locally instead, the daemon stays attached for the next read
+                    logging.error("Daemon query failed: %s", reply.get('result'))
+
+        if interval_store is None:
+            native = config.TW_DATA_BACKEND == 'datafile' and duration in twdata.SUPPORTED_HINTS
+            with twperf.span('export_parse', config.TW_DATA_BACKEND + ' :' + duration) \
+                    as perf_record:
+                if native and config.DATA_LOAD_WORKERS > 1:
+                    interval_store = twdata.load_store_parallel(duration)
+                elif config.STREAM_EXPORT:
+                    if native:
+                        task_stream = twdata.iter_data_intervals(duration)
+                    else:
+                        task_stream = stream_export(duration)
+
+                    interval_store = twdata.IntervalStore.from_stream(task_stream)
+                else:
+                    if native:
+                        task_list = twdata.export_intervals(duration)
+                    else:
+                        cli = [config.CLI_BASE_COMMAND, 'export', ':'+duration]
+                        stdout = execute_cli(cli)
+
+                        task_list = json.loads(stdout)
+
+                    interval_store = twdata.IntervalStore.from_export(task_list)
+
+                perf_record['intervals'] = len(interval_store)
 
-        return 0
+            if config.INTERVAL_CACHE_ENABLE:
+                self.interval_cache.store(cache_key, interval_store)
+
+        return interval_store
+
+    def detach_daemon(self, error: OSError):
+        ''' Stop using a state daemon that went away, data is read locally again '''
+
+        logging.error("Daemon not reachable, detaching: %s", error)
+
+        daemon_client, self.daemon_client = self.daemon_client, None
+        if daemon_client is not None:
+            daemon_client.close()
 
     def collect_tasks_list(self, duration='day') -> int:
         '''
@@ -103,49 +551,122 @@ class TwButtonLogic:
         return number of tasks
         '''
 
-        table_dict = []
-        date_format = "%Y%m%dT%H%M%SZ"
+        interval_store = self.load_interval_store(duration)
 
-        cli = [config.CLI_BASE_COMMAND, 'export', ':'+duration]
-        stdout = execute_cli(cli)
+        # Tasks are dict views onto the columnar interval store
+        self.interval_store = interval_store
+        self.todays_tasks = interval_store.views()
+        self.no_of_tasks_tracked = len(interval_store)
 
-        task_list = json.loads(stdout)
+        return len(interval_store)
 
-        for task_item in task_list:
-            task = {}
+    def get_report(self, duration='week') -> 'twreports.TwReport':
+        ''' Return per tag, per day and tag by day totals of a range hint '''
 
-            task['starttime'] = datetime.strptime(task_item['start'], date_format)
+        range_start, range_end = twdata.hint_range(duration)
 
-            # Calculate Duration (skip or active)
-            if 'end' in task_item.keys():
-                task['stoptime'] = datetime.strptime(task_item['end'], date_format)
-                task['duration'] = task['stoptime'] - task['starttime']
-            else:
-                task['duration'] = 'Active'
+        if config.ROLLUP_CACHE_ENABLE and os.path.isdir(twdata.timewarrior_data_dir()):
+            if self.rollup_cache is None:
+                self.rollup_cache = twreports.RollupCache()
+            return self.rollup_cache.report(range_start, range_end)
+
+        return twreports.build_report(self.load_interval_store(duration), range_start, range_end)
+
+    def calendar_index_between(self, range_start: datetime, range_end: datetime):
+        ''' Return interval index of the calendar events in a range, None without a calendar '''
+        return None
+
+    def get_snapshot(self, duration='day') -> TwSnapshot:
+        '''
+        Fetch tasks once and return a snapshot used for both the task table and
+        the active timer, returns None if the tasks could not be collected
+        '''
 
-            task['id'] = task_item['id']
-            task['tag'] = task_item.get('tags', [''])
+        try:
+            self.collect_tasks_list(duration)
+        except (OSError, ValueError) as error:
+            logging.error("Unable to collect tasks: %s", error)
+            return None
+
+        # Pick up tags of new intervals for the Task suggestions
+        if self.tag_index is not None:
+            self.tag_index.refresh()
+
+        return TwSnapshot(self.todays_tasks, self.interval_store)
+
+    def build_tag_index(self) -> int:
+        '''
+        Build the tag index used for suggestions, reads every data file so it runs on
+        the worker once the first snapshot is shown
+        returns number of tags
+        '''
 
-            table_dict.append(task)
+        if self.tag_index is None:
+            self.tag_index = twtags.TagIndex()
 
-        self.todays_tasks = table_dict
-        self.no_of_tasks_tracked = len(table_dict)
+        return len(self.tag_index)
 
-        return len(table_dict)
+    def get_tag_suggestions(self, prefix: str) -> list:
+        ''' Return used tags starting with the typed text, none until the index is built '''
+
+        tag_index = self.tag_index
+        if tag_index is None:
+            return []
+
+        return tag_index.suggest(prefix, config.TAG_SUGGESTIONS)
+
+    def set_tag_filter(self, filter_text: str):
+        ''' Set the tag filter of the task table, see parse_tag_filter '''
+        self.tag_filter = parse_tag_filter(filter_text)
+
+    def filter_snapshot(self, snapshot: TwSnapshot) -> TwSnapshot:
+        '''
+        Apply the tag filter to a snapshot
+        Snapshots of an interval store are filtered on the tag id bitsets of their store,
+        predicted snapshots compare the tag lists
+        '''
+
+        all_of, any_of, none_of = self.tag_filter
+
+        if snapshot is None or not (all_of or any_of or none_of):
+            return snapshot
+
+        if snapshot.store is not None:
+            rows = snapshot.store.filter_rows(all_of, any_of, none_of)
+        else:
+            rows = []
+            for index, task_item in enumerate(snapshot.tasks):
+                tags = set(task_item['tag'])
+                if tags.issuperset(all_of) and (not any_of or tags.intersection(any_of)) \
+                        and not tags.intersection(none_of):
+                    rows.append(index)
 
-    def return_task_table(self) -> 'tuple[list,int]':
+        return snapshot.filtered(rows)
+
+    def get_tracking_status(self, snapshot: TwSnapshot) -> str:
+        ''' Return active timer from snapshot, fall back to running "timew" '''
+
+        if snapshot is None or not config.SNAPSHOT_ACTIVE_TIMER:
+            return self.get_active_timer()
+
+        return snapshot.tracking_text()
+
+    def return_task_table(self, snapshot=None) -> 'tuple[list,int]':
         ''' Return basic list of tasks used to generate list in UI '''
 
         table_data = []
         max_tag_len = 0
 
-        self.collect_tasks_list()
+        if snapshot is None:
+            self.collect_tasks_list()
+            snapshot = self.filter_snapshot(TwSnapshot(self.todays_tasks, self.interval_store))
 
-        for task_item in self.todays_tasks:
-            table_data.append([ list_to_str(task_item['tag']) , str(task_item['duration']) ])
+        with twperf.span('table_build', str(len(snapshot.tasks)) + ' rows'):
+            for index, task_item in enumerate(snapshot.tasks):
+                table_data.append(snapshot.table_row(index))
 
-            if max_tag_len < len(task_item['tag']):
-                max_tag_len = len(task_item['tag'])
+                if max_tag_len < len(task_item['tag']):
+                    max_tag_len = len(task_item['tag'])
 
         logging.debug("table_data: %s", table_data)
 
@@ -155,31 +676,29 @@ class TwButtonLogic:
         ''' Return details of a specific task '''
 
         task_no, _ = self.get_tw_taskid_from_timetable(values['timew_table'])
-        task = None
 
         logging.debug("task_no: %s", task_no)
 
-        for task_item in self.todays_tasks:
-            logging.debug("task_item: %s", task_item)
-
-            if task_item['id'] == task_no:
-                task = task_item
-                break
+        task = self.interval_store.find(task_no)
 
         logging.debug("task: found %s", task)
 
         return task
 
     def get_tw_taskid_from_timetable(self, timetable) -> 'tuple[int,int]':
-        ''' Collect the TimeWarrior taskid and GUI table id '''
+        '''
+        Collect the TimeWarrior taskid and GUI table id
+        timetable holds the @ids of the selected rows, without a selection the latest task is used
+        '''
 
         if timetable != []:
-            task_no = self.no_of_tasks_tracked - timetable[0]
-            table_no = timetable[0]
-
+            task_no = timetable[0]
         else:
             task_no = 1
-            table_no = self.no_of_tasks_tracked-1
+
+        table_no = None
+        if self.interval_store is not None:
+            table_no = self.interval_store.row_for_id(task_no)
 
         logging.debug("task_no: %s %s ", task_no, table_no)
 
@@ -256,25 +775,84 @@ class TwButtonLogic:
 
         return cli, result_display
 
+    @staticmethod
+    def build_tag_commands(task_ids: list, add_tags=(), remove_tags=()) -> CommandBatch:
+        '''
+        Build the commands adding and removing tags on a set of tasks
+        Each of "timew tag" and "timew untag" is run once for all tasks
+        '''
+
+        taskids = [ '@' + str(i) for i in task_ids ]
+        batch = CommandBatch()
+
+        if add_tags:
+            batch.add([config.CLI_BASE_COMMAND, 'tag'] + taskids + list(add_tags))
+        if remove_tags:
+            batch.add([config.CLI_BASE_COMMAND, 'untag'] + taskids + list(remove_tags))
+
+        return batch
+
+    @staticmethod
+    def build_gap_fill_commands(fills: list) -> CommandBatch:
+        '''
+        Build one "timew track" command per planned (start, end, tag) interval
+        Times are passed in UTC so they are unambiguous around DST changes
+        '''
+
+        batch = CommandBatch()
+
+        for start, end, tag in fills:
+            batch.add([config.CLI_BASE_COMMAND, 'track', \
+                datetime.fromtimestamp(start, timezone.utc).strftime(twdata.TW_DATE_FORMAT), '-', \
+                datetime.fromtimestamp(end, timezone.utc).strftime(twdata.TW_DATE_FORMAT), tag])
+
+        return batch
+
     def button_rename(self, values: dict, cli: str) -> 'tuple[str, str]':
         '''
         Run buttons starting with "Rename"
-        Change the text of the first tag on a task
+        Add, remove or rename single tags on all selected tasks
         '''
 
-        task = self.return_task_details(values)
-        old_description = task['tag'][0]
-        taskid = '@' + str(task['id'])
+        import PySimpleGUI as sg # pylint: disable=import-outside-toplevel
+
+        task_ids = values['timew_table'] or [1]
+        tasks = [ i for i in (self.interval_store.find(i) for i in task_ids) if i is not None ]
+        task_ids = [ i['id'] for i in tasks ]
+        tags = sorted({ j for i in tasks for j in i['tag'] if j != '' })
+
+        if not tasks:
+            return error_popup('Selected task not found')
 
         ### Open window
-        new_description = sg.popup_get_text('Rename Task', default_text=old_description)
+        layout = [
+                    [ sg.Text('Tags of ' + ', '.join('@' + str(i) for i in task_ids)) ],
+                    [ sg.Listbox(values=tags, key='tag_list', size=(30, 6)) ],
+                    [ sg.Text('Tag', size=(8, 1)), sg.InputText(key='new_tag') ],
+                    [ sg.Button('Add', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT),
+                        sg.Button('Remove', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT),
+                        sg.Button('Rename', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT),
+                        sg.Button('Cancel', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT)
+                    ]
+                ]
+
+        event, popup_values = sg.Window('Edit Tags', layout).read(close=True)
 
-        if new_description is not None:
-            execute_cli([config.CLI_BASE_COMMAND, 'tag', taskid, new_description])
-            cli = [config.CLI_BASE_COMMAND, 'untag', taskid, old_description]
-            result_display = "Renamed task"
+        selected_tags = popup_values['tag_list'] if popup_values else []
+        new_tag = popup_values['new_tag'].strip() if popup_values else ''
+
+        if event == 'Add' and new_tag != '':
+            cli = self.build_tag_commands(task_ids, add_tags=[new_tag])
+            result_display = "Added tag " + new_tag
+        elif event == 'Remove' and selected_tags:
+            cli = self.build_tag_commands(task_ids, remove_tags=selected_tags)
+            result_display = "Removed tag " + list_to_str(selected_tags)
+        elif event == 'Rename' and selected_tags and new_tag != '':
+            cli = self.build_tag_commands(task_ids, add_tags=[new_tag], remove_tags=selected_tags)
+            result_display = "Renamed tag " + selected_tags[0] + " to " + new_tag
         else:
-            result_display= "Rename Canceled"
+            cli = None
+            result_display = "Rename Canceled"
 
         return cli, result_display
 
@@ -293,15 +871,15 @@ class TwButtonLogic:
         task_no, _ = self.get_tw_taskid_from_timetable(values['timew_table'])
         taskid = '@'+str(task_no)
 
-        self.run_modify_task(taskid, values)
-
-        cli = None
+        cli = self.run_modify_task(taskid, values)
         result_display = "Modified Task"
 
         return cli, result_display
 
-    def button_details(self, values: dict):
+    def button_details(self, values: dict) -> 'tuple[CommandBatch, str]':
         ''' Collect and display details of a selected specific task '''
+        import PySimpleGUI as sg # pylint: disable=import-outside-toplevel
+
         task = self.return_task_details(values)
 
         start_time = utc_to_local(task['starttime'])
@@ -323,27 +901,292 @@ class TwButtonLogic:
 
         event, values = sg.Window('Task Details', layout).read(close=True)
 
+        cli = None
+        result_display = ""
+
         if event == "Modify":
             taskid = '@'+str(task['id'])
-            logging.debug(taskid, values)
-            self.run_modify_task(taskid, values)
+            logging.debug("%s %s", taskid, values)
+            cli = self.run_modify_task(taskid, values)
+            result_display = "Modified Task"
+
+        return cli, result_display
+
+    def button_report(self, report=None) -> 'tuple[list, str]':
+        '''
+        Display totals per tag and per day for a selectable range
+        Reports of another range are read on the worker when one runs
+        '''
+
+        import PySimpleGUI as sg # pylint: disable=import-outside-toplevel
+
+        report_ranges = ['day', 'yesterday', 'week', 'month', 'year']
+        if report is None:
+            report = self.get_report('week')
+        empty_row = [" "*27, ""]
+
+        layout = [
+            [ sg.Text('Range:', font=config.GLOBAL_FONT), \
+                sg.Combo(report_ranges, default_value='week', key='report_range', readonly=True, \
+                    enable_events=True, font=config.GLOBAL_FONT), \
+                sg.Text('Total: ' + twreports.format_seconds(report.total), size=(20, 1), \
+                    key='report_total', font=config.GLOBAL_FONT) ],
+            [ sg.TabGroup([[
+                sg.Tab('Tags', [[ sg.Table(values=report.tag_rows() or [empty_row], \
+                    headings=['Tag', 'Duration'], max_col_width=30, justification='left', \
+                    num_rows=15, key='report_tags', font=config.GLOBAL_FONT) ]]),
+                sg.Tab('Days', [[ sg.Table(values=report.day_rows() or [empty_row], \
+                    headings=['Date', 'Duration'], max_col_width=30, justification='left', \
+                    num_rows=15, key='report_days', font=config.GLOBAL_FONT) ]]),
+                sg.Tab('Tag by Day', [[ sg.Table(values=report.tag_day_rows() or [[""]*3], \
+                    headings=['Date', 'Tag', 'Duration'], max_col_width=30, \
+                    justification='left', num_rows=15, key='report_matrix', \
+                    font=config.GLOBAL_FONT) ]])
+            ]], font=config.GLOBAL_FONT) ],
+            [ sg.Button('Close', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT) ]
+        ]
+
+        window = sg.Window('Report', layout, modal=True)
+
+        while True:
+            event, values = window.read()
+
+            if event in (sg.WINDOW_CLOSED, 'Close'):
+                break
+
+            if event == 'report_range' and self.worker is not None:
+                self.worker.submit_read('report', self.get_report, values['report_range'], \
+                    window=window)
+                window['report_total'].update('Loading...')
+                continue
+
+            if event == 'report_range':
+                report = self.get_report(values['report_range'])
+            elif event == WORKER_EVENT:
+                report = values[event][1]
+            elif event == WORKER_ERROR_EVENT:
+                window['report_total'].update('Error: ' + str(values[event][1]))
+                continue
+            else:
+                continue
+
+            window['report_total'].update('Total: ' + twreports.format_seconds(report.total))
+            window['report_tags'].update(values=report.tag_rows())
+            window['report_days'].update(values=report.day_rows())
+            window['report_matrix'].update(values=report.tag_day_rows())
+
+        window.close()
+
+        return None, "Report Closed"
+
+    @staticmethod
+    def gap_events(calendar_index, start: int, end: int) -> list:
+        ''' Return calendar events (in start order) overlapping a gap, none without an index '''
+
+        if calendar_index is None:
+            return []
+
+        return calendar_index.between(datetime.fromtimestamp(start, timezone.utc), \
+            datetime.fromtimestamp(end, timezone.utc))
+
+    def gap_entries(self, duration: str, use_calendar: bool) -> tuple:
+        '''
+        Find gaps and overlaps of a range hint for the Gaps window
+        returns (kind, start, end, detail) entries in start order and the calendar index used
+        '''
+
+        range_start, range_end = twdata.hint_range(duration)
+        gaps, overlaps = twreports.find_gaps_overlaps(self.load_interval_store(duration), \
+            range_start, range_end)
+        calendar_index = self.calendar_index_between(range_start, range_end) \
+            if use_calendar else None
+
+        entries = sorted([ ('Gap', i[0], i[1], ', '.join(j.summary for j in \
+            self.gap_events(calendar_index, *i))) for i in gaps ] + [ ('Overlap', i[0], i[1], \
+            '@%s / @%s' % (i[2], i[3])) for i in overlaps ], key=lambda entry: entry[1])
+
+        return entries, calendar_index
+
+    def button_gaps(self, prepared=None) -> 'tuple[CommandBatch, str]':
+        '''
+        Display untracked gaps and overlapping intervals of a selectable range
+        Selected gaps are filled with calendar events and / or the tag in one command batch,
+        other ranges are read on the worker when one runs
+        '''
+
+        import PySimpleGUI as sg # pylint: disable=import-outside-toplevel
+
+        gap_ranges = ['day', 'yesterday', 'week', 'month', 'year']
+        gap_columns = ['Type', 'Date', 'Start', 'End', 'Length', 'Detail']
+        empty_row = [" "*8, "", "", "", "", " "*27]
+
+        def local_text(epoch: int, time_format: str) -> str:
+            return datetime.fromtimestamp(epoch).strftime(time_format)
+
+        def entry_rows() -> list:
+            return [ [kind, local_text(start, '%Y-%m-%d'), local_text(start, '%H:%M'), \
+                local_text(end, '%H:%M'), twreports.format_seconds(end - start), detail] \
+                for kind, start, end, detail in entries ] or [empty_row]
+
+        def status_text() -> str:
+            gap_seconds = sum(i[2] - i[1] for i in entries if i[0] == 'Gap')
+            return "Gaps: %s (%s), Overlaps: %s" % (sum(i[0] == 'Gap' for i in entries), \
+                twreports.format_seconds(gap_seconds), sum(i[0] == 'Overlap' for i in entries))
+
+        entries, calendar_index = prepared if prepared is not None \
+            else self.gap_entries('day', False)
+
+        layout = [
+            [ sg.Text('Range:', font=config.GLOBAL_FONT), \
+                sg.Combo(gap_ranges, default_value='day', key='gap_range', readonly=True, \
+                    enable_events=True, font=config.GLOBAL_FONT), \
+                sg.Text(status_text(), size=(36, 1), key='gap_status', font=config.GLOBAL_FONT) ],
+            [ sg.Table(values=entry_rows(), headings=gap_columns, max_col_width=30, \
+                justification='left', num_rows=15, key='gap_table', \
+                select_mode=sg.TABLE_SELECT_MODE_EXTENDED, font=config.GLOBAL_FONT) ],
+            [ sg.Text('Tag:', font=config.GLOBAL_FONT), \
+                sg.Input(key='gap_tag', size=(24, 1), font=config.GLOBAL_FONT), \
+                sg.Checkbox(text='Use calendar events', key='gap_calendar', default=False, \
+                    enable_events=True, visible=config.ICALBUDDY_ENABLE, font=config.GLOBAL_FONT) ],
+            [ sg.Button('Fill Selected', font=config.GLOBAL_FONT), \
+                sg.Button('Select Gaps', font=config.GLOBAL_FONT), \
+                sg.Button('Close', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT) ]
+        ]
+
+        window = sg.Window('Gaps', layout, modal=True)
+        batch = None
+        result_display = "Gaps Closed"
+
+        while True:
+            event, values = window.read()
+
+            if event in (sg.WINDOW_CLOSED, 'Close'):
+                break
+
+            if event in ('gap_range', 'gap_calendar') and self.worker is not None:
+                self.worker.submit_read('gaps', self.gap_entries, values['gap_range'], \
+                    values['gap_calendar'], window=window)
+                window['gap_status'].update("Loading...")
+            elif event in ('gap_range', 'gap_calendar', WORKER_EVENT):
+                if event == WORKER_EVENT:
+                    entries, calendar_index = values[event][1]
+                else:
+                    entries, calendar_index = self.gap_entries(values['gap_range'], \
+                        values['gap_calendar'])
+                window['gap_table'].update(values=entry_rows())
+                window['gap_status'].update(status_text())
+            elif event == WORKER_ERROR_EVENT:
+                window['gap_status'].update("Error: " + str(values[event][1]))
+            elif event == 'Select Gaps':
+                window['gap_table'].update(select_rows=[ i for i in range(len(entries)) \
+                    if entries[i][0] == 'Gap' ])
+            elif event == 'Fill Selected':
+                fills = []
+                selected = [ entries[i] for i in values['gap_table'] \
+                    if i < len(entries) and entries[i][0] == 'Gap' ]
+                for _, start, end, _ in selected:
+                    fills.extend(twreports.fill_gap(start, end, values['gap_tag'].strip(), \
+                        self.gap_events(calendar_index, start, end)))
+
+                if not fills:
+                    window['gap_status'].update("Select gaps and set a tag or calendar events")
+                    continue
+
+                batch = self.build_gap_fill_commands(fills)
+                result_display = "Filled %s gaps with %s intervals" % (len(selected), len(fills))
+                break
+
+        window.close()
+
+        return batch, result_display
+
+    @staticmethod
+    def button_diagnostics() -> 'tuple[list, str]':
+        ''' Display timings of processes, export parsing, table builds and window updates '''
+
+        import PySimpleGUI as sg # pylint: disable=import-outside-toplevel
+
+        summary_columns = ['Kind', 'Count', 'p50 ms', 'p90 ms', 'p99 ms', 'Max ms']
+        empty_row = [" "*14, "", "", "", "", ""]
+
+        def recent_text() -> str:
+            return '\n'.join("%-12s %9.2f ms %s%s" % (i['kind'], i['wall_ms'], i['name'], \
+                " (exit %s)" % i['exit_code'] if i.get('exit_code') else "") \
+                for i in twperf.RECORDER.recent())
+
+        layout = [
+            [ sg.Table(values=twperf.RECORDER.summary() or [empty_row], \
+                headings=summary_columns, key='perf_summary', num_rows=5, \
+                justification='left', font=config.GLOBAL_FONT) ],
+            [ sg.MLine(twperf.RECORDER.histogram_text(), key='perf_histogram', size=(60, 8), \
+                font=config.GLOBAL_FONT) ],
+            [ sg.MLine(recent_text(), key='perf_recent', size=(60, 10), font=config.GLOBAL_FONT) ],
+            [ sg.Text('', size=(60, 1), key='perf_status', font=config.GLOBAL_FONT) ],
+            [ sg.Button('Refresh', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT), \
+                sg.Button('Dump', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT), \
+                sg.Button('Clear', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT), \
+                sg.Button('Close', size=(config.BUTTON_SIZE, 1), font=config.GLOBAL_FONT) ]
+        ]
+
+        window = sg.Window('Diagnostics', layout, modal=True)
+
+        while True:
+            event, _ = window.read()
+
+            if event in (sg.WINDOW_CLOSED, 'Close'):
+                break
+
+            if event == 'Dump':
+                json_file = sg.popup_get_file('Dump timings to', save_as=True, \
+                    default_path=config.PERF_DUMP_FILE or 'twgui_perf.json')
+                if json_file:
+                    try:
+                        twperf.RECORDER.dump(json_file)
+                    except OSError as error:
+                        logging.error("Timings dump to %s failed: %s", json_file, error)
+                        window['perf_status'].update("Dump failed: %s" % error)
+                    else:
+                        window['perf_status'].update("Dumped to %s" % json_file)
+            elif event == 'Clear':
+                twperf.RECORDER.clear()
+
+            window['perf_summary'].update(values=twperf.RECORDER.summary() or [empty_row])
+            window['perf_histogram'].update(twperf.RECORDER.histogram_text())
+            window['perf_recent'].update(recent_text())
+
+        window.close()
+
+        return None, "Diagnostics Closed"
 
-        return 0
     ##### Stop methods supporting UI button elements
     #
 
-    def button_logic(self, event: str, values: dict) -> 'tuple[bytes, str]':
+    def prepare_button(self, event: str):
         '''
-        Execute Button based events executing TimeWarrior CLI commands
+        Read the data the handler of a button in PREPARED_EVENTS needs, runs on the worker
+        so the GUI does not wait for TimeWarrior, returned data is passed to button_command
+        '''
+
+        if event == 'Report':
+            return self.get_report('week')
+        if event == 'Gaps':
+            return self.gap_entries('day', False)
+
+        return None
+
+    def button_command(self, event: str, values: dict, prepared=None) -> 'tuple[list, str]':
+        '''
+        Build the TimeWarrior CLI command for a Button based event
         Command line is extended based on the button selection and outputs
-        of the hander functions when used
+        of the hander functions when used, runs on the GUI thread as handlers may open popups
+        prepared is the result of prepare_button, read now if not given
         '''
 
         cli = [config.CLI_BASE_COMMAND]
 
         # TODO: Fix logic to remove calendar options
         if event == 'Start Meeting':
-            cli, result_display = self.button_start_meeting(cli)
+            cli, result_display = self.button_start_meeting(cli, prepared)
         elif event in 'Start':
             cli, result_display = self.button_start(values, cli)
         elif event == 'Track':
@@ -354,39 +1197,176 @@ class TwButtonLogic:
             # Modify start of current / last task
             cli, result_display = self.button_modify(values, cli)
         elif event == "Fix Start":
-            start_time = self.get_current_calendar_starttime()
-            cli.extend(['modify', 'start', '@1', start_time])
-            result_display = "Modified Start time to " + start_time
+            start_time = self.get_current_calendar_starttime(prepared)
+            if start_time:
+                cli.extend(['modify', 'start', '@1', start_time])
+                result_display = "Modified Start time to " + start_time
+            else:
+                cli, result_display = error_popup('Nothing available on Calendar')
         elif event == "Rename":
             cli, result_display = self.button_rename(values, cli)
         elif event in ('Continue', "Delete"):
             cli, result_display = self.button_continue_delete(event, values, cli)
         elif event == "Refresh":
             result_display = "Default: See Results"
+        elif event == "Report":
+            cli, result_display = self.button_report(prepared)
+        elif event == "Gaps":
+            cli, result_display = self.button_gaps(prepared)
+        elif event == "Diagnostics":
+            cli, result_display = self.button_diagnostics()
         elif event == "Details":
-            self.button_details(values)
-            result_display = ""
+            cli, result_display = self.button_details(values)
         elif event == "Calendar Track":
-            cli, result_display = self.button_calendar_track(cli)
+            cli, result_display = self.button_calendar_track(cli, prepared)
         else:
             result_display = "Button not Matched"
             logging.error("******* Button not Matched '%s' *************", event)
 
-        if cli:
-            # TODO: Run more then one command
-            result = execute_cli(cli)
+        return cli, result_display
+
+    def predict_snapshot(self, event: str, values: dict, snapshot: TwSnapshot) -> TwSnapshot:
+        '''
+        Return the snapshot expected after a button event, shown before the command finished
+        Call after button_command, values hold the derived start and stop times
+        returns None if the effect can not be predicted
+        '''
+
+        if snapshot is None:
+            return None
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        close_active = now if snapshot.active_task is not None else None
+
+        try:
+            if event == 'Start':
+                start = local_input_to_utc('', values['starttime'], now)
+                if snapshot.active_task is not None and start <= snapshot.active_task['starttime']:
+                    return None
+                return snapshot.predict(close_at=start if close_active else None, \
+                    add=predicted_task(start, None, [values['taskdesc']]))
+
+            if event == 'Stop':
+                if snapshot.active_task is None:
+                    return None
+                end = local_input_to_utc('', values['stoptime'], now)
+                if end <= snapshot.active_task['starttime']:
+                    return None
+                return snapshot.predict(close_at=end)
+
+            if event == 'Track':
+                if values['starttime'] == '' or values['stoptime'] == '' or (values['date'] != '' \
+                        and values['date'] != utc_to_local(now).strftime('%Y-%m-%d')):
+                    # Only intervals of today are in the snapshot
+                    return None
+                start = local_input_to_utc(values['date'], values['starttime'], now)
+                end = local_input_to_utc(values['date'], values['stoptime'], now)
+                return snapshot.predict(add=predicted_task(start, end, [values['taskdesc']]))
+
+            if event in ('Continue', 'Delete'):
+                task_no, _ = self.get_tw_taskid_from_timetable(values['timew_table'])
+                task = next(( i for i in snapshot.tasks if i['id'] == task_no ), None)
+                if task is None:
+                    return None
+                if event == 'Delete':
+                    return snapshot.predict(remove_id=task_no)
+                if task is snapshot.active_task:
+                    return None
+                return snapshot.predict(close_at=close_active, \
+                    add=predicted_task(now, None, list(task['tag'])))
+        except ValueError:
+            return None
+
+        return None
+
+    def run_command_status(self, cli, result_display: str) -> 'tuple[bytes, str, bool]':
+        '''
+        Execute command or CommandBatch built by button_command
+        Safe to call from a worker thread, the status is replaced if a command failed
+        returns output, status and True if a command failed
+        '''
+
+        failed = False
+
+        daemon_client = self.daemon_client
+
+        if cli and daemon_client is not None:
+            # Run by the state daemon so it reads its snapshot again
+            if not isinstance(cli, CommandBatch):
+                cli = CommandBatch([cli])
+
+            try:
+                reply = daemon_client.request('run', \
+                    commands=[ i[1:] for i in cli.commands ], result=result_display)
+                result = reply.get('output', '').encode(config.ENCODING)
+                result_display = reply['result']
+                failed = not reply['ok']
+            except OSError as error:
+                # The command may or may not have reached the daemon, it is not run again
+                self.detach_daemon(error)
+                result = b''
+                result_display = "Daemon not reachable, check if the command ran: " + str(error)
+                failed = True
+        elif cli:
+            if not isinstance(cli, CommandBatch):
+                cli = CommandBatch([cli])
+
+            result, error_status = cli.run()
+            if error_status is not None:
+                result_display = error_status
+                failed = True
         else:
             # return null bytes for CLI output if cli is not set
             result = b''
 
+        return result, result_display, failed
+
+    def run_command(self, cli, result_display: str) -> 'tuple[bytes, str]':
+        ''' Execute command or CommandBatch built by button_command '''
+
+        result, result_display, _ = self.run_command_status(cli, result_display)
+
         return result, result_display
 
+    def button_logic(self, event: str, values: dict) -> 'tuple[bytes, str]':
+        '''
+        Execute Button based events executing TimeWarrior CLI commands
+        '''
+
+        cli, result_display = self.button_command(event, values)
+
+        return self.run_command(cli, result_display)
+
 class TwCalendarClass(TwButtonLogic):
-    ''' This class adds iCalBuddy functionality '''
+    ''' This class adds calendar (iCalBuddy or .ics file) functionality '''
 
     def __init__(self):
         ''' initialize the class '''
         TwButtonLogic.__init__(self)
+        self.calendar_provider = None
+        self.calendar_cache = None
+        self.calendar_cache_time = 0.0
+
+    PREPARED_EVENTS = TwButtonLogic.PREPARED_EVENTS + ('Start Meeting', 'Fix Start', \
+        'Calendar Track')
+
+    def prepare_button(self, event: str):
+        ''' Calendar lookups may run icalbuddy, they are read on the worker as well '''
+
+        if event in ('Start Meeting', 'Fix Start'):
+            return self.get_current_calendar_events()
+        if event == 'Calendar Track':
+            return self.get_calendar_entries()
+
+        return TwButtonLogic.prepare_button(self, event)
+
+    def button_command(self, event: str, values: dict, prepared=None) -> 'tuple[list, str]':
+        ''' Refresh also drops the cached calendar entries '''
+
+        if event == "Refresh":
+            self.invalidate_calendar_cache()
+
+        return TwButtonLogic.button_command(self, event, values, prepared)
 
     #
     ## Start iCalBuddy Function
@@ -407,52 +1387,105 @@ class TwCalendarClass(TwButtonLogic):
 
         return str(stdout, config.ENCODING)
 
-    def get_current_calendar_entry(self) -> str:
+    def get_calendar_provider(self) -> 'twcalendar.CalendarProvider':
         '''
-        Use icalbuddy to get the meeting on your calendar right now
+        Return the calendar provider, the calendar module is imported and the provider
+        created on first use to keep start up fast
         '''
-        stdout = self.run_icalbuddy('eventsNow', \
-            exclude_fields='url,location,notes,attendees,datetime')
 
-        return stdout
+        if self.calendar_provider is None:
+            import twcalendar # pylint: disable=import-outside-toplevel
+            self.calendar_provider = twcalendar.calendar_provider(self.run_icalbuddy)
+
+        return self.calendar_provider
 
-    def get_current_calendar_starttime(self) -> str:
+    def get_calendar_index(self) -> 'twcalendar.CalendarIndex':
         '''
-        Use icalbuddy to get the start time of the currnet meeting on your calendar right now
+        Return interval index of todays calendar events from the calendar provider
+        The index is cached for ICALBUDDY_CACHE_TTL seconds
         '''
-        stdout = self.run_icalbuddy('eventsNow')
 
-        start_time = stdout.split("|")[1].split(" - ")[0].strip()
+        if self.calendar_cache is not None \
+                and self.calendar_cache[0] == datetime.now().date() \
+                and time.monotonic() - self.calendar_cache_time < config.ICALBUDDY_CACHE_TTL:
+            logging.debug("calendar cache hit")
+            return self.calendar_cache[1]
+
+        calendar_provider = self.get_calendar_provider()
+
+        import twcalendar # pylint: disable=import-outside-toplevel
+        range_start, range_end = twcalendar.day_range()
+        calendar_index = twcalendar.CalendarIndex([ i for i in \
+            calendar_provider.events(range_start, range_end) if not i.all_day ])
+
+        self.calendar_cache = (datetime.now().date(), calendar_index)
+        self.calendar_cache_time = time.monotonic()
+
+        return calendar_index
+
+    def calendar_index_between(self, range_start: datetime, range_end: datetime):
+        ''' Return interval index of the calendar events (without all day events) in a range '''
+
+        import twcalendar # pylint: disable=import-outside-toplevel
+
+        return twcalendar.CalendarIndex([ i for i in \
+            self.get_calendar_provider().events(range_start, range_end) if not i.all_day ])
+
+    def get_current_calendar_events(self) -> list:
+        '''
+        Return todays calendar entries running right now
+        Answered from the cached index of todays events instead of running icalbuddy eventsNow
+        '''
+
+        current_events = [ i.entry() for i in \
+            self.get_calendar_index().at(datetime.now().astimezone()) ]
+
+        logging.debug("current_events: %s", current_events)
+
+        return current_events
+
+    def get_current_calendar_entry(self, current_events=None) -> str:
+        '''
+        Get the meeting on your calendar right now
+        '''
+        if current_events is None:
+            current_events = self.get_current_calendar_events()
+
+        if not current_events:
+            return ''
+
+        return current_events[0][0]
+
+    def get_current_calendar_starttime(self, current_events=None) -> str:
+        '''
+        Get the start time of the currnet meeting on your calendar right now
+        '''
+        if current_events is None:
+            current_events = self.get_current_calendar_events()
+
+        if not current_events:
+            return ''
+
+        start_time = current_events[0][1].strip()
         logging.debug("start_time: %s", start_time)
 
         return start_time
 
+    def invalidate_calendar_cache(self):
+        ''' Drop cached calendar entries, next lookup queries the calendar provider '''
+        self.calendar_cache = None
+
     def get_calendar_entries(self, date_range='today') -> list:
         '''
-        Collect calendar entries from icalbuddy
+        Collect calendar entries from the calendar provider
         returns list of lists containing task name, start time,  stop time
         '''
 
-        return_list = []
-
         # TODO: selectable date ranges
-        if date_range == 'today':
-            icalbuddy_command = 'eventsToday'
+        if date_range != 'today':
+            logging.error("Unsupported calendar range %s", date_range)
 
-        stdout = self.run_icalbuddy(icalbuddy_command)
-
-        output_list = stdout.split("\n")
-        for i in output_list:
-            logging.debug("i: %s", i)
-            try:
-                tag, time = i.split(" | ")
-                starttime, endtime = time.split(' - ')
-                return_list.append([tag, starttime, endtime])
-            except ValueError:
-                if i != '':
-                    logging.error("Error with calendar entry %s", i)
-                else:
-                    continue
+        return_list = [ i.entry() for i in self.get_calendar_index().events ]
 
         logging.debug("return_list: %s", return_list)
 
@@ -460,10 +1493,10 @@ class TwCalendarClass(TwButtonLogic):
     ## End iCalBuddy Function
     #
 
-    def button_start_meeting(self, cli: str) -> 'tuple[str, str]':
+    def button_start_meeting(self, cli: str, current_events=None) -> 'tuple[str, str]':
         ''' Run Start Meeting from calendar info routine '''
 
-        calendarentry = self.get_current_calendar_entry()
+        calendarentry = self.get_current_calendar_entry(current_events)
         if calendarentry:
             cli.extend(["start", calendarentry])
             result_display = "Started meeting"
@@ -472,9 +1505,12 @@ class TwCalendarClass(TwButtonLogic):
 
         return cli, result_display
 
-    def button_calendar_track(self, cli: str) -> list:
+    def button_calendar_track(self, cli: str, calendar_entries=None) -> list:
         ''' Create Task based on calendar entry from today '''
-        calendar_entries = self.get_calendar_entries()
+        import PySimpleGUI as sg # pylint: disable=import-outside-toplevel
+
+        if calendar_entries is None:
+            calendar_entries = self.get_calendar_entries()
 
         calendar_columns = ['Tag', 'Start', 'Stop']
 
@@ -0,0 +1,166 @@
+#!/usr/bin/which python3
+'''
+    This script records timings of the hot paths (TimeWarrior and iCalBuddy processes,
+    export parsing, table building and window updates) in a bounded ring buffer
+    with latency histograms, shown in the diagnostics window and dumped to JSON
+    Author: Ben Mason
+'''
+
+__author__ = "Ben Mason"
+__copyright__ = "Copyright 2022"
+__version__ = "2.0.0"
+__email__ = "locutus@the-collective.net"
+__status__ = "Production"
+
+import json
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import deque
+import config
+
+# Upper bounds (ms) of the histogram buckets, the last bucket counts everything slower
+HISTOGRAM_BOUNDS = [ 0.25 * 2 ** i for i in range(16) ]
+
+
+class NullSpan:
+    ''' Span used while instrumentation is disabled, records nothing '''
+
+    def __enter__(self) -> dict:
+        # Callers fill in the record, a throw away dict so threads never share one
+        return {}
+
+    def __exit__(self, *exc_info):
+        return False
+
+class Span:
+    ''' Time a block and add it to the recorder, the block may fill in exit_code and bytes '''
+
+    __slots__ = ('recorder', 'record', 'start')
+
+    def __init__(self, recorder, kind: str, name: str):
+        ''' initialize the class '''
+        self.recorder = recorder
+        self.record = {'kind': kind, 'name': name}
+        self.start = 0.0
+
+    def __enter__(self) -> dict:
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc_info):
+        self.record['wall_ms'] = (time.perf_counter() - self.start) * 1000
+        self.record['time'] = time.time()
+        self.recorder.add(self.record)
+        return False
+
+class PerfRecorder:
+    '''
+    Bounded ring buffer of timing records and a latency histogram per kind
+    Records are dicts of kind, name, wall_ms, time and optionally exit_code and bytes
+    '''
+
+    def __init__(self, size=None):
+        ''' initialize the class '''
+        self.records = deque(maxlen=size if size is not None else config.PERF_BUFFER_SIZE)
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def add(self, record: dict):
+        ''' Add a record, the oldest record is dropped once the buffer is full '''
+
+        bucket = bisect_left(HISTOGRAM_BOUNDS, record['wall_ms'])
+
+        with self.lock:
+            self.records.append(record)
+            histogram = self.histograms.get(record['kind'])
+            if histogram is None:
+                histogram = self.histograms[record['kind']] = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+            histogram[bucket] += 1
+
+        logging.debug("perf %s %s %.2f ms", record['kind'], record['name'], record['wall_ms'])
+
+    def recent(self, count=50) -> list:
+        ''' Return the latest records, newest first '''
+
+        with self.lock:
+            records = list(self.records)
+
+        return records[:-count - 1:-1]
+
+    def summary(self) -> list:
+        '''
+        Return [kind, count, p50, p90, p99, max] rows of the records in the buffer,
+        latencies in ms
+        '''
+
+        with self.lock:
+            records = list(self.records)
+
+        timings = {}
+        for record in records:
+            timings.setdefault(record['kind'], []).append(record['wall_ms'])
+
+        rows = []
+        for kind, wall_times in sorted(timings.items()):
+            wall_times.sort()
+            count = len(wall_times)
+            rows.append([kind, count] + [ round(wall_times[min(count - 1, int(i * count))], 2) \
+                for i in (0.5, 0.9, 0.99) ] + [round(wall_times[-1], 2)])
+
+        return rows
+
+    def histogram_text(self) -> str:
+        ''' Return the histograms as text, one line per kind and non empty bucket '''
+
+        lines = []
+
+        with self.lock:
+            histograms = { i: list(j) for i, j in self.histograms.items() }
+
+        for kind, histogram in sorted(histograms.items()):
+            lines.append(kind)
+            for index, count in enumerate(histogram):
+                if count:
+                    bound = "<= %g ms" % HISTOGRAM_BOUNDS[index] \
+                        if index < len(HISTOGRAM_BOUNDS) else "> %g ms" % HISTOGRAM_BOUNDS[-1]
+                    lines.append("  %-12s %6d" % (bound, count))
+
+        return '\n'.join(lines)
+
+    def dump(self, json_file: str):
+        ''' Write records, summary and histograms to a JSON file '''
+
+        with self.lock:
+            perf_data = {'records': list(self.records), 'histogram_bounds_ms': HISTOGRAM_BOUNDS, \
+                'histograms': { i: list(j) for i, j in self.histograms.items() }}
+        perf_data['summary'] = self.summary()
+
+        with open(json_file, 'w', encoding=config.ENCODING) as perf_file:
+            json.dump(perf_data, perf_file, indent=1)
+
+    def clear(self):
+        ''' Drop all records and histograms '''
+
+        with self.lock:
+            self.records.clear()
+            self.histograms = {}
+
+RECORDER = PerfRecorder()
+NULL_SPAN = NullSpan()
+
+def span(kind: str, name=''):
+    '''
+    Return a context manager timing a block of the given kind
+    Costs one config lookup while PERF_INSTRUMENTATION is disabled
+    '''
+
+    if not config.PERF_INSTRUMENTATION:
+        return NULL_SPAN
+
+    return Span(RECORDER, kind, name)
+
+####### Start Main Function #############
+if __name__ == "__main__":
+    pass
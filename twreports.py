@@ -0,0 +1,454 @@
+#!/usr/bin/which python3
+'''
+    This script builds range reports (per tag, per day and tag by day totals) from
+    the columnar interval store, totals are clipped to the range and to local days
+    the same way "timew summary" does
+    Author: Ben Mason
+'''
+
+__author__ = "Ben Mason"
+__copyright__ = "Copyright 2022"
+__version__ = "2.0.0"
+__email__ = "locutus@the-collective.net"
+__status__ = "Production"
+
+import os
+import json
+import time
+import logging
+from array import array
+from datetime import datetime, timezone, timedelta, date
+import config
+import twdata
+
+NO_TAG = '(no tag)'
+ROLLUP_VERSION = 1
+
+
+def format_seconds(seconds: int) -> str:
+    ''' Format seconds as H:MM:SS like "timew summary" '''
+    return "%d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+def split_by_local_day(start: int, end: int, offset: int) -> list:
+    '''
+    Split an interval (epoch seconds) at local midnights
+    returns list of (local day number, seconds)
+    '''
+
+    pieces = []
+
+    while start < end:
+        day = (start + offset) // 86400
+        boundary = (day + 1) * 86400 - offset
+
+        # DST change during the day, the offset at midnight decides the boundary
+        boundary_offset = time.localtime(boundary).tm_gmtoff
+        if boundary_offset != offset:
+            boundary = (day + 1) * 86400 - boundary_offset
+
+        piece_end = min(end, boundary)
+        pieces.append((day, piece_end - start))
+        offset = boundary_offset
+        start = piece_end
+
+    return pieces
+
+class TwReport:
+    '''
+    Aggregated totals of a range
+    Tag totals and the tag by day matrix are flat int64 arrays indexed by interned tag id
+    '''
+
+    def __init__(self, range_start: int, range_end: int, first_day: int, no_of_days: int, \
+            tag_names: list):
+        ''' initialize the class '''
+        self.range_start = range_start
+        self.range_end = range_end
+        self.first_day = first_day
+        self.no_of_days = no_of_days
+        self.tag_names = [ i if i != '' else NO_TAG for i in tag_names ]
+        self.total = 0
+        self.day_totals = array('q', bytes(8 * no_of_days))
+        self.tag_totals = array('q', bytes(8 * len(tag_names)))
+        self.matrix = array('q', bytes(8 * no_of_days * len(tag_names)))
+
+    def day_date(self, day_index: int) -> date:
+        ''' Return date of a day column '''
+        return date(1970, 1, 1) + timedelta(days=self.first_day + day_index)
+
+    def tag_rows(self) -> list:
+        ''' Return [tag, total] rows sorted by total '''
+
+        rows = sorted(zip(self.tag_names, self.tag_totals), key=lambda row: -row[1])
+
+        return [ [tag, format_seconds(seconds)] for tag, seconds in rows if seconds > 0 ]
+
+    def day_rows(self) -> list:
+        ''' Return [date, total] rows of days with tracked time '''
+
+        return [ [self.day_date(i).isoformat(), format_seconds(self.day_totals[i])] \
+            for i in range(self.no_of_days) if self.day_totals[i] > 0 ]
+
+    def tag_day_rows(self) -> list:
+        ''' Return [date, tag, total] rows of the tag by day matrix without empty cells '''
+
+        rows = []
+
+        for day_index in range(self.no_of_days):
+            for tag_id, tag in enumerate(self.tag_names):
+                seconds = self.matrix[tag_id * self.no_of_days + day_index]
+                if seconds > 0:
+                    rows.append([self.day_date(day_index).isoformat(), tag, \
+                        format_seconds(seconds)])
+
+        return rows
+
+def build_report(store: 'twdata.IntervalStore', range_start: datetime, range_end: datetime, \
+        now=None) -> TwReport:
+    '''
+    Aggregate the intervals of a store over [range_start, range_end)
+    Works on the epoch and tag id arrays, intervals are clipped to the range and split at
+    local midnight
+    '''
+
+    if now is None:
+        now = int(datetime.now(timezone.utc).timestamp())
+
+    start_epoch = int(range_start.timestamp())
+    end_epoch = int(range_end.timestamp())
+    first_day = (start_epoch + time.localtime(start_epoch).tm_gmtoff) // 86400
+    last_day = (end_epoch - 1 + time.localtime(end_epoch - 1).tm_gmtoff) // 86400
+
+    # Untagged intervals are counted on an extra tag
+    no_tag_id = len(store.tag_names)
+    report = TwReport(start_epoch, end_epoch, first_day, last_day - first_day + 1, \
+        store.tag_names + [''])
+    no_of_days = report.no_of_days
+
+    rows = store.rows_in_range(start_epoch, end_epoch, now)
+    starts = store.starts[rows.start:rows.stop]
+    ends = store.ends[rows.start:rows.stop]
+    clipped_starts = [ max(i, start_epoch) for i in starts ]
+    clipped_ends = [ min(now if i == twdata.OPEN_END else i, end_epoch) for i in ends ]
+    offsets = twdata.local_offsets(clipped_starts)
+    tag_offsets = store.tag_offsets
+    tag_ids = store.tag_ids
+
+    for index, row in enumerate(rows):
+        start = clipped_starts[index]
+        end = clipped_ends[index]
+        if end <= start:
+            continue
+
+        row_tags = tag_ids[tag_offsets[row]:tag_offsets[row + 1]] or (no_tag_id,)
+        seconds = end - start
+        report.total += seconds
+
+        for tag_id in row_tags:
+            report.tag_totals[tag_id] += seconds
+
+        for day, day_seconds in split_by_local_day(start, end, offsets[index]):
+            day_index = day - first_day
+            report.day_totals[day_index] += day_seconds
+            for tag_id in row_tags:
+                report.matrix[tag_id * no_of_days + day_index] += day_seconds
+
+    logging.debug("report %s intervals, total %s", len(rows), report.total)
+
+    return report
+
+def work_windows(range_start: int, range_end: int) -> list:
+    '''
+    Return (start, end) epoch seconds of the local working hours (GAP_DAY_START to
+    GAP_DAY_END on GAP_WEEKDAYS) within a range, an end not after the start runs to the
+    next day
+    '''
+
+    day_start = datetime.strptime(config.GAP_DAY_START, '%H:%M').time()
+    day_end = datetime.strptime(config.GAP_DAY_END, '%H:%M').time()
+    day = datetime.fromtimestamp(range_start).date() - timedelta(days=1)
+    last_day = datetime.fromtimestamp(range_end).date()
+    windows = []
+
+    while day <= last_day:
+        if day.weekday() in config.GAP_WEEKDAYS:
+            window_start = datetime.combine(day, day_start).astimezone()
+            window_end = datetime.combine(day, day_end).astimezone()
+            if window_end <= window_start:
+                window_end = datetime.combine(day + timedelta(days=1), day_end).astimezone()
+
+            start = max(range_start, int(window_start.timestamp()))
+            end = min(range_end, int(window_end.timestamp()))
+            if start < end:
+                windows.append((start, end))
+
+        day += timedelta(days=1)
+
+    return windows
+
+def find_gaps_overlaps(store: 'twdata.IntervalStore', range_start: datetime, \
+        range_end: datetime, now=None) -> 'tuple[list,list]':
+    '''
+    Sweep the intervals of a store over [range_start, range_end) in start order
+    returns untracked gaps as (start, end) within the working hours, at least
+    GAP_MIN_MINUTES long and not in the future, and overlaps as (start, end, id, id)
+    of an interval with the interval reaching furthest before it
+    '''
+
+    if now is None:
+        now = int(datetime.now(timezone.utc).timestamp())
+
+    start_epoch = int(range_start.timestamp())
+    end_epoch = min(int(range_end.timestamp()), now)
+    windows = work_windows(start_epoch, end_epoch)
+    min_seconds = config.GAP_MIN_MINUTES * 60
+    gaps = []
+    overlaps = []
+
+    # Time up to covered_until is tracked, covering_row holds the interval reaching furthest
+    covered_until = start_epoch
+    covering_row = None
+    window_index = 0
+
+    def add_gap(gap_start: int, gap_end: int):
+        ''' Clip an untracked stretch to the working hours, windows are passed in order '''
+        nonlocal window_index
+
+        while window_index < len(windows) and windows[window_index][1] <= gap_start:
+            window_index += 1
+
+        for window_start, window_end in windows[window_index:]:
+            if window_start >= gap_end:
+                break
+            start = max(gap_start, window_start)
+            end = min(gap_end, window_end)
+            if end - start >= min_seconds:
+                gaps.append((start, end))
+
+    for row in store.rows_in_range(start_epoch, end_epoch, now):
+        start = max(store.starts[row], start_epoch)
+        end = min(now if store.ends[row] == twdata.OPEN_END else store.ends[row], end_epoch)
+        if end <= start:
+            continue
+
+        if start > covered_until:
+            add_gap(covered_until, start)
+        elif start < covered_until:
+            overlaps.append((start, min(end, covered_until), store.ids[covering_row], \
+                store.ids[row]))
+
+        if end > covered_until:
+            covered_until = end
+            covering_row = row
+
+    if covered_until < end_epoch:
+        add_gap(covered_until, end_epoch)
+
+    logging.debug("gaps %s, overlaps %s", len(gaps), len(overlaps))
+
+    return gaps, overlaps
+
+def fill_gap(gap_start: int, gap_end: int, tag: str, events=()) -> list:
+    '''
+    Plan the intervals filling a gap, calendar events (sorted by start) are clipped to
+    the gap and to each other, the rest of the gap is given the tag if one is set
+    returns list of (start, end, tag)
+    '''
+
+    fills = []
+    filled_until = gap_start
+
+    for event in events:
+        start = max(int(event.start.timestamp()), filled_until)
+        end = min(int(event.end.timestamp()), gap_end)
+        if end <= start:
+            continue
+        if tag and start > filled_until:
+            fills.append((filled_until, start, tag))
+        fills.append((start, end, event.summary))
+        filled_until = end
+
+    if tag and filled_until < gap_end:
+        fills.append((filled_until, gap_end, tag))
+
+    return fills
+
+def rollup_month_file(file_path: str) -> dict:
+    '''
+    Compute per local day, per tag seconds of the closed intervals in one monthly data file
+    The open interval is returned separately as it grows with time
+    '''
+
+    intervals = twdata.read_data_file(file_path)
+    closed = [ i for i in intervals if 'end' in i ]
+    starts = twdata.parse_tw_timestamps([ i['start'] for i in closed ])
+    ends = twdata.parse_tw_timestamps([ i['end'] for i in closed ])
+    days = {}
+
+    for interval, start, end, offset in zip(closed, starts, ends, twdata.local_offsets(starts)):
+        for day, seconds in split_by_local_day(start, end, offset):
+            day_rollup = days.setdefault(str(day), {'total': 0, 'tags': {}})
+            day_rollup['total'] += seconds
+            for tag in interval.get('tags', ['']):
+                day_rollup['tags'][tag] = day_rollup['tags'].get(tag, 0) + seconds
+
+    open_intervals = [ [twdata.parse_tw_timestamp(i['start']), i.get('tags', [''])] \
+        for i in intervals if 'end' not in i ]
+
+    return {'days': days, 'open': open_intervals}
+
+class RollupCache:
+    '''
+    Persistent per day, per tag totals of the closed intervals, one entry per monthly data file
+    An entry is recomputed only when the stat signature of its data file changed, reports
+    over long ranges read the daily rows instead of re-exporting the intervals
+    '''
+
+    def __init__(self, cache_file=None, data_dir=None):
+        ''' initialize the class '''
+        self.cache_file = cache_file if cache_file is not None else config.ROLLUP_CACHE_FILE
+        self.data_dir = data_dir if data_dir is not None else twdata.timewarrior_data_dir()
+        self.months = {}
+        self.load()
+
+    @staticmethod
+    def timezone_key() -> list:
+        ''' Daily rollups depend on the local timezone '''
+        return [time.tzname[0], time.tzname[1], time.timezone, time.altzone]
+
+    def load(self):
+        ''' Read cache file, an unreadable or outdated file is ignored '''
+
+        try:
+            with open(self.cache_file, encoding=config.ENCODING) as rollup_file:
+                rollup_data = json.load(rollup_file)
+        except (OSError, ValueError):
+            return
+
+        if rollup_data.get('version') == ROLLUP_VERSION \
+                and rollup_data.get('timezone') == self.timezone_key() \
+                and rollup_data.get('data_dir') == self.data_dir:
+            self.months = rollup_data.get('months', {})
+
+    def save(self):
+        ''' Write cache file atomically '''
+
+        rollup_data = {'version': ROLLUP_VERSION, 'timezone': self.timezone_key(), \
+            'data_dir': self.data_dir, 'months': self.months}
+        temp_file = self.cache_file + '.tmp'
+
+        try:
+            with open(temp_file, 'w', encoding=config.ENCODING) as rollup_file:
+                json.dump(rollup_data, rollup_file)
+            os.replace(temp_file, self.cache_file)
+        except OSError as error:
+            logging.error("Unable to write rollup cache %s: %s", self.cache_file, error)
+
+    def refresh(self) -> int:
+        '''
+        Recompute entries of data files whose stat signature changed
+        returns number of recomputed month files
+        '''
+
+        file_list = twdata.list_data_files(self.data_dir)
+        recomputed = 0
+
+        for file_name in file_list:
+            file_path = os.path.join(self.data_dir, file_name)
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue
+
+            signature = [file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino]
+            if file_name in self.months and self.months[file_name]['signature'] == signature:
+                continue
+
+            month = rollup_month_file(file_path)
+            month['signature'] = signature
+            self.months[file_name] = month
+            recomputed += 1
+
+        for file_name in [ i for i in self.months if i not in file_list ]:
+            del self.months[file_name]
+            recomputed += 1
+
+        if recomputed:
+            logging.debug("rollup cache recomputed %s month files", recomputed)
+            self.save()
+
+        return recomputed
+
+    def report(self, range_start: datetime, range_end: datetime, now=None) -> TwReport:
+        '''
+        Build a report from the daily rollups, ranges are whole local days
+        The open interval is added live, clipped to the range
+        raises ValueError if the range does not start and end at local midnight
+        '''
+
+        if now is None:
+            now = int(datetime.now(timezone.utc).timestamp())
+
+        start_epoch = int(range_start.timestamp())
+        end_epoch = int(range_end.timestamp())
+
+        # Daily rows can not be split, build_report clips partial days
+        for epoch in (start_epoch, end_epoch):
+            if (epoch + time.localtime(epoch).tm_gmtoff) % 86400 != 0:
+                raise ValueError("Range is not aligned to local days: " + \
+                    datetime.fromtimestamp(epoch).isoformat())
+
+        self.refresh()
+        first_day = (start_epoch + time.localtime(start_epoch).tm_gmtoff) // 86400
+        last_day = (end_epoch - 1 + time.localtime(end_epoch - 1).tm_gmtoff) // 86400
+
+        day_rows = []
+        open_intervals = []
+        tag_names = []
+        tag_index = {}
+
+        for month in self.months.values():
+            open_intervals.extend(month['open'])
+            for day_text, day_rollup in month['days'].items():
+                if first_day <= int(day_text) <= last_day:
+                    day_rows.append((int(day_text), day_rollup['total'], day_rollup['tags']))
+
+        for _, _, day_tags in day_rows:
+            for tag in day_tags:
+                if tag not in tag_index:
+                    tag_index[tag] = len(tag_names)
+                    tag_names.append(tag)
+        for _, open_tags in open_intervals:
+            for tag in open_tags:
+                if tag not in tag_index:
+                    tag_index[tag] = len(tag_names)
+                    tag_names.append(tag)
+
+        report = TwReport(start_epoch, end_epoch, first_day, last_day - first_day + 1, tag_names)
+        no_of_days = report.no_of_days
+
+        for day, day_total, day_tags in day_rows:
+            day_index = day - first_day
+            report.total += day_total
+            report.day_totals[day_index] += day_total
+            for tag, seconds in day_tags.items():
+                report.tag_totals[tag_index[tag]] += seconds
+                report.matrix[tag_index[tag] * no_of_days + day_index] += seconds
+
+        for open_start, open_tags in open_intervals:
+            start = max(open_start, start_epoch)
+            end = min(now, end_epoch)
+            if end <= start:
+                continue
+            for day, seconds in split_by_local_day(start, end, time.localtime(start).tm_gmtoff):
+                report.total += seconds
+                report.day_totals[day - first_day] += seconds
+                for tag in open_tags:
+                    report.tag_totals[tag_index[tag]] += seconds
+                    report.matrix[tag_index[tag] * no_of_days + day - first_day] += seconds
+
+        return report
+
+####### Start Main Function #############
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,289 @@
+#!/usr/bin/which python3
+'''
+    This script keeps the task table in the GUI in sync with the interval snapshots,
+    only inserted, removed and changed rows are sent to the Tk treeview
+    Author: Ben Mason
+'''
+
+__author__ = "Ben Mason"
+__copyright__ = "Copyright 2022"
+__version__ = "2.0.0"
+__email__ = "locutus@the-collective.net"
+__status__ = "Production"
+
+import logging
+import twperf
+
+
+def diff_rows(old_keys: list, old_rows: dict, new_keys: list, new_rows: dict) \
+        -> 'tuple[list,list,list]':
+    '''
+    Compare two ordered sets of table rows
+    returns lists of removed keys, inserted (index, key) and changed keys
+    '''
+
+    new_key_set = set(new_keys)
+    removed = [ i for i in old_keys if i not in new_key_set ]
+    inserted = []
+    changed = []
+
+    for index, key in enumerate(new_keys):
+        if key not in old_rows:
+            inserted.append((index, key))
+        elif old_rows[key] != new_rows[key]:
+            changed.append(key)
+
+    return removed, inserted, changed
+
+class TableModel:
+    '''
+    Rows of a PySimpleGUI Table element keyed by interval (unique row keys)
+    Each snapshot is diffed against the rows on screen and only the differences are applied,
+    the user's selection stays on the same intervals
+    '''
+
+    def __init__(self, table_element=None):
+        ''' initialize the class '''
+        self.element = None
+        self.treeview = None
+        self.keys = []
+        self.rows = {}
+        self.iids = {}
+        self.ids = {}
+        self.next_iid = 1
+
+        if table_element is not None:
+            self.attach(table_element)
+
+    def attach(self, table_element):
+        ''' Take over the rows of a finalized Table element '''
+
+        self.element = table_element
+        self.treeview = table_element.Widget
+
+        for iid in self.treeview.get_children():
+            self.treeview.delete(iid)
+
+        self.keys = []
+        self.rows = {}
+        self.iids = {}
+        self.ids = {}
+
+    def update(self, row_keys: list, table_data: list, row_ids=None) -> 'tuple[int,int,int]':
+        '''
+        Apply new table data, row_keys identify the interval of each row
+        row_ids are the TimeWarrior @ids of the rows, used to map selections to tasks
+        returns number of removed, inserted and changed rows
+        '''
+
+        new_rows = dict(zip(row_keys, table_data))
+        removed, inserted, changed = diff_rows(self.keys, self.rows, row_keys, new_rows)
+
+        for key in removed:
+            self.treeview.delete(self.iids.pop(key))
+
+        for key in changed:
+            self.treeview.item(self.iids[key], values=new_rows[key])
+
+        kept_keys = [ i for i in row_keys if i in self.iids ]
+        if kept_keys != [ i for i in self.keys if i in new_rows ]:
+            # Intervals changed order, rare enough to move every kept row
+            for index, key in enumerate(kept_keys):
+                self.treeview.move(self.iids[key], '', index)
+
+        for index, key in inserted:
+            iid = self.treeview.insert('', index, iid=self.next_iid, values=new_rows[key])
+            self.iids[key] = iid
+            self.next_iid += 1
+
+        self.keys = list(row_keys)
+        self.rows = new_rows
+        if row_ids is not None:
+            self.ids = dict(zip(row_keys, row_ids))
+        self.sync_element()
+
+        logging.debug("table update removed: %s inserted: %s changed: %s", \
+            len(removed), len(inserted), len(changed))
+
+        return len(removed), len(inserted), len(changed)
+
+    def update_row(self, row_key, row: list):
+        ''' Change the values of a single row '''
+
+        if row_key not in self.iids or self.rows[row_key] == row:
+            return
+
+        self.rows[row_key] = row
+        self.treeview.item(self.iids[row_key], values=row)
+        self.sync_element()
+
+    def sync_element(self):
+        ''' Keep the PySimpleGUI element attributes in line with the treeview '''
+
+        if self.element is not None:
+            self.element.Values = [ self.rows[i] for i in self.keys ]
+            self.element.tree_ids = [ self.iids[i] for i in self.keys ]
+
+    def selected_keys(self) -> list:
+        ''' Return keys of the selected rows '''
+
+        iid_to_key = { str(iid): key for key, iid in self.iids.items() }
+
+        return [ iid_to_key[str(i)] for i in self.treeview.selection() if str(i) in iid_to_key ]
+
+    def selected_ids(self) -> list:
+        ''' Return TimeWarrior @ids of the selected rows '''
+        return [ self.ids[i] for i in self.selected_keys() if i in self.ids ]
+
+class VirtualTableModel:
+    '''
+    Table of a large interval list where only the visible rows plus a page buffer on
+    either side are inserted in the Tk treeview
+    Rows are built on demand from a row function, the materialized window is kept in a
+    TableModel so moving the window only inserts and removes the rows at its edges
+    '''
+
+    def __init__(self, table_element=None, visible_rows=20, buffer_rows=20):
+        ''' initialize the class '''
+        self.table = TableModel(table_element)
+        self.visible_rows = visible_rows
+        self.buffer_rows = buffer_rows
+        self.keys = []
+        self.ids = []
+        self.key_index = {}
+        self.row_func = None
+        self.offset = 0
+        self.first = 0
+        self.last = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def attach(self, table_element):
+        ''' Take over the rows of a finalized Table element '''
+        self.table.attach(table_element)
+        self.first = self.last = 0
+
+    def set_source(self, row_keys: list, row_ids: list, row_func) -> 'tuple[int,int,int]':
+        '''
+        Replace the rows of the table, row_func(index) returns the values of one row
+        The window stays on the interval at its top if it is still in the list
+        '''
+
+        top_key = self.keys[self.offset] if self.offset < len(self.keys) else None
+
+        self.keys = row_keys
+        self.ids = row_ids
+        self.key_index = { key: index for index, key in enumerate(row_keys) }
+        self.row_func = row_func
+
+        if top_key in self.key_index:
+            self.offset = self.key_index[top_key]
+
+        return self.render()
+
+    def max_offset(self) -> int:
+        ''' Return offset showing the last page '''
+        return max(0, len(self.keys) - self.visible_rows)
+
+    def render(self, force=True) -> 'tuple[int,int,int]':
+        '''
+        Materialize the visible rows and the page buffer around the offset
+        Without force the treeview is only changed once the visible rows leave the buffer
+        '''
+
+        self.offset = min(max(self.offset, 0), self.max_offset())
+
+        if not force and self.first <= self.offset \
+                and self.offset + self.visible_rows <= self.last:
+            self.scroll_view()
+            return 0, 0, 0
+
+        self.first = max(0, self.offset - self.buffer_rows)
+        self.last = min(len(self.keys), self.offset + self.visible_rows + self.buffer_rows)
+
+        with twperf.span('table_build', '%s of %s rows' % (self.last - self.first, len(self.keys))):
+            changes = self.table.update(self.keys[self.first:self.last], \
+                [ self.row_func(i) for i in range(self.first, self.last) ], \
+                self.ids[self.first:self.last])
+        self.scroll_view()
+
+        return changes
+
+    def scroll_view(self):
+        ''' Scroll the treeview so the row at the offset is the top row '''
+
+        if self.last > self.first:
+            self.table.treeview.yview_moveto((self.offset - self.first) / (self.last - self.first))
+
+    def view_offset(self) -> int:
+        ''' Return offset of the top row shown by the treeview (after native scrolling) '''
+
+        if self.last <= self.first:
+            return self.offset
+
+        top_fraction = self.table.treeview.yview()[0]
+
+        return self.first + round(top_fraction * (self.last - self.first))
+
+    def scrolled(self) -> 'tuple[int,int,int]':
+        ''' Follow mouse wheel or key scrolling of the treeview, refill the buffer at its edges '''
+
+        self.offset = self.view_offset()
+
+        near_top = self.offset - self.first < self.buffer_rows // 2 and self.first > 0
+        near_bottom = self.last - self.offset - self.visible_rows < self.buffer_rows // 2 \
+            and self.last < len(self.keys)
+
+        if near_top or near_bottom:
+            return self.render()
+
+        return 0, 0, 0
+
+    def scroll(self, rows: int) -> 'tuple[int,int,int]':
+        ''' Move the window by a number of rows '''
+
+        self.offset = self.view_offset() + rows
+
+        return self.render(force=False)
+
+    def page(self, pages: int) -> 'tuple[int,int,int]':
+        ''' Move the window by a number of pages '''
+        return self.scroll(pages * self.visible_rows)
+
+    def jump_to(self, index: int) -> 'tuple[int,int,int]':
+        ''' Show the row at index on top '''
+
+        self.offset = index
+
+        return self.render(force=False)
+
+    def update_row(self, row_key, row: list):
+        ''' Change the values of a single row if it is materialized '''
+        self.table.update_row(row_key, row)
+
+    def selected_keys(self) -> list:
+        ''' Return keys of the selected rows '''
+        return self.table.selected_keys()
+
+    def selected_ids(self) -> list:
+        ''' Return TimeWarrior @ids of the selected rows '''
+        return self.table.selected_ids()
+
+    def table_data(self) -> list:
+        ''' Return the materialized rows '''
+        return [ self.table.rows[i] for i in self.table.keys ]
+
+    def position_text(self) -> str:
+        ''' Return position of the window for a status line '''
+
+        if not self.keys:
+            return ""
+
+        last_shown = min(len(self.keys), self.offset + self.visible_rows)
+
+        return "%s-%s of %s" % (self.offset + 1, last_shown, len(self.keys))
+
+####### Start Main Function #############
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,163 @@
+#!/usr/bin/which python3
+'''
+    This script keeps a prefix index over every tag found in the TimeWarrior data files,
+    used to suggest task names while typing, ranked by how often and how recently
+    a tag was used
+    Author: Ben Mason
+'''
+
+__author__ = "Ben Mason"
+__copyright__ = "Copyright 2022"
+__version__ = "2.0.0"
+__email__ = "locutus@the-collective.net"
+__status__ = "Production"
+
+import os
+import bisect
+import heapq
+import logging
+import threading
+from datetime import datetime, timezone
+import config
+import twdata
+
+
+def month_tag_stats(file_path: str) -> dict:
+    '''
+    Count tag use in one monthly data file
+    returns {tag: [count, latest start]}, start times are TimeWarrior timestamps which
+    sort in time order as text
+    '''
+
+    tag_stats = {}
+
+    for interval in twdata.read_data_file(file_path):
+        for tag in interval.get('tags', ()):
+            stats = tag_stats.get(tag)
+            if stats is None:
+                tag_stats[tag] = [1, interval['start']]
+            else:
+                stats[0] += 1
+                if interval['start'] > stats[1]:
+                    stats[1] = interval['start']
+
+    return tag_stats
+
+class TagIndex:
+    '''
+    Sorted (case folded) list of all tags with use count and last use
+    Prefix lookups are a bisect into the sorted list, only data files whose stat signature
+    changed are read again on refresh
+    '''
+
+    def __init__(self, data_dir=None):
+        ''' initialize the class '''
+        self.data_dir = data_dir if data_dir is not None else twdata.timewarrior_data_dir()
+        self.lock = threading.Lock()
+        self.months = {}
+        self.stats = {}
+        self.last_used = {}
+        self.keys = []
+        self.refresh()
+
+    def refresh(self) -> int:
+        '''
+        Read data files that changed since the last refresh and update the index
+        returns number of files read
+        '''
+
+        if not os.path.isdir(self.data_dir):
+            return 0
+
+        file_list = twdata.list_data_files(self.data_dir)
+        changed = {}
+
+        for file_name in file_list:
+            file_path = os.path.join(self.data_dir, file_name)
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue
+
+            signature = (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+            if file_name in self.months and self.months[file_name][0] == signature:
+                continue
+
+            changed[file_name] = (signature, month_tag_stats(file_path))
+
+        removed = [ i for i in self.months if i not in file_list ]
+
+        if changed or removed:
+            with self.lock:
+                for file_name in removed:
+                    self.remove_month(self.months.pop(file_name)[1])
+                for file_name, month in changed.items():
+                    if file_name in self.months:
+                        self.remove_month(self.months[file_name][1])
+                    self.months[file_name] = month
+                    self.add_month(month[1])
+
+                # Epoch of the last use, parsed once here instead of on every keystroke
+                self.last_used = dict(zip(self.stats, twdata.parse_tw_timestamps( \
+                    [ i[1] for i in self.stats.values() ])))
+
+            logging.debug("tag index read %s data files, %s tags", len(changed), len(self.stats))
+
+        return len(changed)
+
+    def add_month(self, tag_stats: dict):
+        ''' Add the tag counts of one data file, new tags are inserted in the sorted list '''
+
+        for tag, (count, last_used) in tag_stats.items():
+            stats = self.stats.get(tag)
+            if stats is None:
+                self.stats[tag] = [count, last_used]
+                bisect.insort(self.keys, (tag.casefold(), tag))
+            else:
+                stats[0] += count
+                stats[1] = max(stats[1], last_used)
+
+    def remove_month(self, tag_stats: dict):
+        ''' Take the tag counts of one data file out again '''
+
+        for tag, (count, _) in tag_stats.items():
+            stats = self.stats[tag]
+            stats[0] -= count
+
+            if stats[0] <= 0:
+                del self.stats[tag]
+                key_index = bisect.bisect_left(self.keys, (tag.casefold(), tag))
+                del self.keys[key_index]
+            else:
+                # Latest use may have been in the removed file
+                stats[1] = max([ i[1][tag][1] for i in self.months.values() \
+                    if tag in i[1] and i[1] is not tag_stats ], default=stats[1])
+
+    def __len__(self) -> int:
+        return len(self.stats)
+
+    def score(self, tag: str, now: float) -> float:
+        ''' Rank of a tag, use count decayed by the age of its last use '''
+
+        age_days = max(0.0, now - self.last_used[tag]) / 86400
+
+        return self.stats[tag][0] * 0.5 ** (age_days / config.TAG_RECENCY_HALF_LIFE)
+
+    def suggest(self, prefix: str, limit=8, now=None) -> list:
+        ''' Return up to limit tags starting with prefix (ignoring case), best ranked first '''
+
+        if now is None:
+            now = datetime.now(timezone.utc).timestamp()
+
+        folded = prefix.casefold()
+
+        with self.lock:
+            first = bisect.bisect_left(self.keys, (folded,))
+            last = bisect.bisect_left(self.keys, (folded + '\U0010ffff',))
+            candidates = [ i[1] for i in self.keys[first:last] ]
+
+            return heapq.nlargest(limit, candidates, key=lambda tag: self.score(tag, now))
+
+####### Start Main Function #############
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,146 @@
+#!/usr/bin/which python3
+'''
+    This script watches the TimeWarrior database for changes made outside of the GUI
+    (timew in a shell, hooks, other tools) and posts a refresh event to the window
+    Uses inotify on Linux and falls back to polling the file stat signature
+    Author: Ben Mason
+'''
+
+__author__ = "Ben Mason"
+__copyright__ = "Copyright 2022"
+__version__ = "2.0.0"
+__email__ = "locutus@the-collective.net"
+__status__ = "Production"
+
+import os
+import select
+import logging
+import threading
+import ctypes
+import ctypes.util
+import config
+import twdata
+
+WATCH_EVENT = '-DATA-CHANGED-'
+
+# inotify event masks (sys/inotify.h)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = os.O_NONBLOCK
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def open_inotify(watch_dirs: list):
+    '''
+    Create an inotify descriptor watching the given directories
+    returns file descriptor or None when inotify is not available
+    '''
+
+    libc_name = ctypes.util.find_library('c')
+    if libc_name is None:
+        return None
+
+    try:
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        inotify_fd = libc.inotify_init1(IN_NONBLOCK)
+    except (OSError, AttributeError):
+        return None
+
+    if inotify_fd < 0:
+        return None
+
+    for watch_dir in watch_dirs:
+        if libc.inotify_add_watch(inotify_fd, watch_dir.encode(), WATCH_MASK) < 0:
+            logging.debug("inotify watch failed for %s", watch_dir)
+            os.close(inotify_fd)
+            return None
+
+    return inotify_fd
+
+class DataWatcher:
+    '''
+    Watch the data directory and undo.data, post WATCH_EVENT to the window once the
+    stat signature changed and no further change was seen for the debounce time
+    '''
+
+    def __init__(self, window, db_path=None):
+        ''' initialize the class '''
+        self.window = window
+        self.db_path = db_path if db_path is not None else twdata.timewarrior_db_path()
+        self.signature = twdata.data_signature(self.db_path)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        ''' Start the watcher thread '''
+        self.thread.start()
+
+    def stop(self):
+        ''' Stop the watcher thread '''
+        self.stop_event.set()
+
+    def wait_inotify(self, inotify_fd: int, timeout: float) -> bool:
+        ''' Wait for inotify events, returns True if any were read '''
+
+        readable, _, _ = select.select([inotify_fd], [], [], timeout)
+        if not readable:
+            return False
+
+        try:
+            while os.read(inotify_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        return True
+
+    def run(self):
+        ''' Watcher thread main loop '''
+
+        inotify_fd = open_inotify([self.db_path, os.path.join(self.db_path, 'data')])
+        logging.debug("data watcher using %s", "inotify" if inotify_fd is not None else "polling")
+
+        try:
+            while not self.stop_event.is_set():
+                if inotify_fd is not None:
+                    if not self.wait_inotify(inotify_fd, 1.0):
+                        continue
+
+                    # Debounce, wait for the writes of one timew command to settle
+                    while self.wait_inotify(inotify_fd, config.WATCH_DEBOUNCE):
+                        pass
+                else:
+                    if self.stop_event.wait(config.WATCH_POLL_INTERVAL):
+                        break
+
+                    if twdata.data_signature(self.db_path) == self.signature:
+                        continue
+
+                    self.stop_event.wait(config.WATCH_DEBOUNCE)
+
+                self.check()
+        finally:
+            if inotify_fd is not None:
+                os.close(inotify_fd)
+
+    def check(self) -> bool:
+        ''' Post refresh event if the data files changed since the last check '''
+
+        signature = twdata.data_signature(self.db_path)
+
+        if signature == self.signature:
+            return False
+
+        self.signature = signature
+        logging.debug("TimeWarrior data changed, posting refresh")
+        self.window.write_event_value(WATCH_EVENT, None)
+
+        return True
+
+####### Start Main Function #############
+if __name__ == "__main__":
+    pass
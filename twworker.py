@@ -0,0 +1,106 @@
+#!/usr/bin/which python3
+'''
+    This script runs TimeWarrior commands on a worker thread so the GUI event loop
+    never blocks on the CLI, results are posted back to the window as events
+    Author: Ben Mason
+'''
+
+__author__ = "Ben Mason"
+__copyright__ = "Copyright 2022"
+__version__ = "2.0.0"
+__email__ = "locutus@the-collective.net"
+__status__ = "Production"
+
+import logging
+import queue
+import threading
+
+WORKER_EVENT = '-WORKER-'
+WORKER_ERROR_EVENT = '-WORKER-ERROR-'
+
+
+class CommandWorker:
+    '''
+    Single worker thread executing jobs in submission order
+    Writes always run, a queued read is skipped when a newer read of the same name
+    was submitted after it
+    '''
+
+    def __init__(self, window):
+        ''' initialize the class '''
+        self.window = window
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.read_generation = {}
+        self.pending = 0
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit_write(self, name: str, func, *args, tag=None):
+        ''' Queue a job changing the database '''
+
+        with self.lock:
+            self.pending += 1
+
+        self.jobs.put((name, None, func, args, tag, self.window))
+
+    def submit_read(self, name: str, func, *args, tag=None, window=None):
+        '''
+        Queue a read job, superseding any queued read with the same name
+        The result is posted to window if given (a popup window), else to the main window
+        '''
+
+        with self.lock:
+            self.pending += 1
+            generation = self.read_generation.get(name, 0) + 1
+            self.read_generation[name] = generation
+
+        self.jobs.put((name, generation, func, args, tag, \
+            window if window is not None else self.window))
+
+    def busy(self) -> bool:
+        ''' Return True while jobs are queued or running '''
+        return self.pending > 0
+
+    def stop(self):
+        ''' Stop the worker thread after the queued jobs '''
+        self.jobs.put(None)
+
+    def run(self):
+        ''' Worker thread main loop '''
+
+        while True:
+            job = self.jobs.get()
+
+            if job is None:
+                break
+
+            name, generation, func, args, tag, window = job
+
+            if generation is not None and generation != self.read_generation.get(name):
+                logging.debug("coalesced read: %s", name)
+                with self.lock:
+                    self.pending -= 1
+                continue
+
+            try:
+                result = func(*args)
+                event = WORKER_EVENT
+            except Exception as error: # pylint: disable=broad-except
+                logging.error("Background job %s failed: %s", name, error)
+                result = error
+                event = WORKER_ERROR_EVENT
+
+            with self.lock:
+                self.pending -= 1
+
+            try:
+                window.write_event_value(event, (name, result, tag))
+            except Exception as error: # pylint: disable=broad-except
+                # A popup window may have been closed before its result arrived
+                logging.debug("Result of %s not delivered: %s", name, error)
+
+####### Start Main Function #############
+if __name__ == "__main__":
+    pass